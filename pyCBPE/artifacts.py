@@ -0,0 +1,139 @@
+""" This is the package responsible for storing the outputs of the dataset
+generation stages, so only the stale stages are run again. """
+
+import glob
+import hashlib
+import inspect
+import os
+import shutil
+import numpy as np
+
+_FINGERPRINT_LENGTH = 16
+_FILE_BLOCK_SIZE = 1 << 20
+
+
+def fingerprint(*parts):
+    """ Fingerprint of a stage from its name, code, configuration and the
+    fingerprint of its input, or of any other parts with a stable repr. """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def code_fingerprint(*code_objects):
+    """ Fingerprint of the source of the modules and functions run by a
+    stage, such as its chunk function instead of the whole script. """
+    digest = hashlib.sha256()
+    for code_object in code_objects:
+        digest.update(inspect.getsource(code_object).encode())
+
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """ Fingerprint of the content of an input file. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for block in iter(lambda: input_file.read(_FILE_BLOCK_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def pack_ragged(arrays):
+    """ Concatenate 1-D arrays of any length into their values and the
+    offsets where each array starts, plus a last offset at the end. """
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    values = np.concatenate(arrays) if len(arrays) > 0 else np.array([])
+
+    return offsets, values
+
+
+def unpack_ragged(offsets, values):
+    """ Split values packed by pack_ragged back into a list of arrays. """
+    return [values[offsets[index]:offsets[index + 1]] for index in range(len(offsets) - 1)]
+
+
+class ArtifactStore:
+    """ Arrays produced by a stage, stored on disk under a name and the
+    fingerprint of the stage.
+
+    Each artifact is a directory with one .npy file per array, loaded as
+    read only memory maps. Arrays too large to be built in memory can be
+    filled in place through open_array. An artifact is only found if it was stored with
+    the same fingerprint, so a change in the stage code, configuration or
+    input makes it stale. Storing an artifact replaces the stale versions
+    with the same name.
+    """
+
+    def __init__(self, path):
+        self._path = path
+
+    def load(self, name, stage_fingerprint):
+        artifact_path = self._artifact_path(name, stage_fingerprint)
+        if not os.path.isdir(artifact_path):
+            return None
+
+        arrays = {}
+        for array_path in glob.glob(os.path.join(artifact_path, "*.npy")):
+            array_name = os.path.splitext(os.path.basename(array_path))[0]
+            arrays[array_name] = np.load(array_path, mmap_mode="r")
+
+        return arrays
+
+    def open_array(self, name, stage_fingerprint, array_name, shape, dtype):
+        """ Writable .npy memory map of an array of an artifact that is not
+        stored yet, created in its temporary directory. A stage fills it
+        chunk by chunk and returns it with the other arrays to save, which
+        keeps it in place instead of writing it again. """
+        temporary_path = self._artifact_path(name, stage_fingerprint) + ".tmp"
+        os.makedirs(temporary_path, exist_ok=True)
+
+        return np.lib.format.open_memmap(os.path.join(temporary_path, array_name + ".npy"), mode="w+", dtype=dtype, shape=shape)
+
+    def save(self, name, stage_fingerprint, arrays):
+        artifact_path = self._artifact_path(name, stage_fingerprint)
+        temporary_path = artifact_path + ".tmp"
+
+        os.makedirs(temporary_path, exist_ok=True)
+        array_paths = set()
+        for array_name, array in arrays.items():
+            array_path = os.path.join(temporary_path, array_name + ".npy")
+            array_paths.add(array_path)
+            if isinstance(array, np.memmap) and array.filename == os.path.abspath(array_path):
+                array.flush()
+            else:
+                np.save(array_path, np.asarray(array))
+
+        # arrays left by an interrupted computation are not part of it
+        for left_path in glob.glob(os.path.join(temporary_path, "*.npy")):
+            if left_path not in array_paths:
+                os.remove(left_path)
+
+        for stale_path in glob.glob(os.path.join(self._path, glob.escape(name) + "-*")):
+            if stale_path != temporary_path:
+                shutil.rmtree(stale_path, ignore_errors=True)
+
+        # the artifact only appears once all of its arrays are written
+        os.rename(temporary_path, artifact_path)
+
+    def load_or_compute(self, name, stage_fingerprint, compute):
+        """ Load the artifact or, if it is missing or stale, compute its
+        arrays with compute() and store them. Either way the stored memory
+        maps are returned, so the next stages read them the same way. """
+        arrays = self.load(name, stage_fingerprint)
+        if arrays is None:
+            shutil.rmtree(self._artifact_path(name, stage_fingerprint) + ".tmp", ignore_errors=True)
+            self.save(name, stage_fingerprint, compute())
+            arrays = self.load(name, stage_fingerprint)
+
+        return arrays
+
+    def _artifact_path(self, name, stage_fingerprint):
+        return os.path.join(self._path, name + "-" + stage_fingerprint[0:_FINGERPRINT_LENGTH])
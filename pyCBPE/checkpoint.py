@@ -0,0 +1,79 @@
+""" This is the package responsible for keeping the progress of a dataset
+generation run, so an interrupted run resumes from its last chunk. """
+
+import glob
+import json
+import os
+import numpy as np
+import pyCBPE.constants as consts
+
+
+class RunManifest:
+    """ Completed chunks of the stages of a run and their outputs.
+
+    The manifest is a json file in the run directory that records, for each
+    stage, its fingerprint and the [start, stop) rows of its completed
+    chunks. The arrays of each chunk are stored in a .npz file next to it.
+    Chunk files and the manifest are written to a temporary file that then
+    replaces the old one, so an interrupted run never leaves a half written
+    chunk marked as completed. A stage started again with another
+    fingerprint discards its chunks.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._manifest_path = os.path.join(path, consts.RUN_MANIFEST_FILENAME)
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.isfile(self._manifest_path):
+            with open(self._manifest_path) as manifest_file:
+                self._stages = json.load(manifest_file)
+        else:
+            self._stages = {}
+
+    def start_stage(self, stage_name, stage_fingerprint):
+        stage = self._stages.get(stage_name)
+        if stage is not None and stage["fingerprint"] == stage_fingerprint:
+            return
+
+        self._remove_chunk_files(stage_name)
+        self._stages[stage_name] = {"fingerprint": stage_fingerprint, "completed_chunks": []}
+        self._save_manifest()
+
+    def finish_stage(self, stage_name):
+        """ Drop the chunks of a stage whose whole output is stored elsewhere. """
+        self._remove_chunk_files(stage_name)
+        if self._stages.pop(stage_name, None) is not None:
+            self._save_manifest()
+
+    def is_completed(self, stage_name, chunk_start, chunk_stop):
+        return [chunk_start, chunk_stop] in self._stages[stage_name]["completed_chunks"]
+
+    def save_chunk(self, stage_name, chunk_start, chunk_stop, arrays):
+        chunk_path = self._chunk_path(stage_name, chunk_start, chunk_stop)
+        temporary_path = chunk_path + ".tmp"
+
+        with open(temporary_path, "wb") as chunk_file:
+            np.savez(chunk_file, **arrays)
+        os.replace(temporary_path, chunk_path)
+
+        self._stages[stage_name]["completed_chunks"].append([chunk_start, chunk_stop])
+        self._save_manifest()
+
+    def load_chunk(self, stage_name, chunk_start, chunk_stop):
+        with np.load(self._chunk_path(stage_name, chunk_start, chunk_stop)) as chunk_arrays:
+            return dict(chunk_arrays)
+
+    def _chunk_path(self, stage_name, chunk_start, chunk_stop):
+        return os.path.join(self._path, stage_name + "-" + str(chunk_start) + "-" + str(chunk_stop) + ".npz")
+
+    def _remove_chunk_files(self, stage_name):
+        for chunk_path in glob.glob(os.path.join(self._path, glob.escape(stage_name) + "-*.npz*")):
+            os.remove(chunk_path)
+
+    def _save_manifest(self):
+        temporary_path = self._manifest_path + ".tmp"
+        with open(temporary_path, "w") as manifest_file:
+            json.dump(self._stages, manifest_file)
+
+        os.replace(temporary_path, self._manifest_path)
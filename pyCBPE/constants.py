@@ -10,6 +10,10 @@ DATASET_PATH = "/files/dataset/"
 PPG_SEG_MATRIX_SPLIT_1_PATH = DATASET_PATH + "ppg_matrix_split_1.csv"
 ABP_SEG_MATRIX = "/files/dataset/abp_matrix_split_1.csv"
 
+# Sample segments shipped with the repository
+PPG_SEG_PATH = "/files/ppg_seg.csv"
+ABP_SEG_PATH = "/files/abp_seg.csv"
+
 FEATURES_AND_LABELS_DF_PREFIX = "features_and_labels_df_split_"
 ORIGINAL_DATASET_PREFIX = "Part_"
 CSV_SUFIX = ".csv"
@@ -18,13 +22,43 @@ MAT_SUFIX = ".mat"
 PPG_DF_PREFIX = "ppg_seg_df_split_"
 ABP_DF_PREFIX = "abp_seg_df_split_"
 
+# Binary segment stores of the dataset splits
+SEGMENT_STORE_PREFIX = "segment_store_split_"
+SEGMENT_STORE_HEADER = "header.json"
+SEGMENT_STORE_SUFIX = ".f32"
+PPG_SIGNAL = "ppg"
+ABP_SIGNAL = "abp"
+SEGMENT_STORE_SIGNALS = [PPG_SIGNAL, ABP_SIGNAL]
+# Columns of the signals in the records of the original dataset files
+MAT_PPG_COLUMN = 0
+MAT_ABP_COLUMN = 1
+
 FEATURES_AND_LABELS_DF_SPLIT_1_PATH = ROOT_PATH + DATASET_PATH + "features_and_labels_df_split_1.csv"
 FEATURES_AND_LABELS_DF_SPLIT_2_PATH = ROOT_PATH + DATASET_PATH + "features_and_labels_df_split_2.csv"
 FEATURES_AND_LABELS_DF_SPLIT_3_PATH = ROOT_PATH + DATASET_PATH + "features_and_labels_df_split_3.csv"
 FEATURES_AND_LABELS_DF_SPLIT_4_PATH = ROOT_PATH + DATASET_PATH + "features_and_labels_df_split_4.csv"
+FEATURES_AND_LABELS_DF_SPLITS_PATHS = [
+    FEATURES_AND_LABELS_DF_SPLIT_1_PATH,
+    FEATURES_AND_LABELS_DF_SPLIT_2_PATH,
+    FEATURES_AND_LABELS_DF_SPLIT_3_PATH,
+    FEATURES_AND_LABELS_DF_SPLIT_4_PATH
+]
 
 OUTPUT_PATH = "/files/dataset/features_and_labels_df.csv"
 
+# Outputs of the dataset generation stages
+ARTIFACTS_PATH = "/files/artifacts/"
+PREPROCESSING_STAGE = "preprocessing"
+NORMALIZATION_STAGE = "normalization"
+KEY_POINTS_STAGE = "key_points"
+HRV_STAGE = "hrv"
+BEAT_LABELS_STAGE = "beat_labels"
+FEATURES_AND_LABELS_STAGE = "features_and_labels"
+
+# Progress of the dataset generation runs
+RUNS_PATH = "/files/runs/"
+RUN_MANIFEST_FILENAME = "manifest.json"
+
 
 # Estimators paths
 ALL_METRICS_FILENAME = "all_metrics.csv"
@@ -35,6 +69,67 @@ STATS_METRICS_FILENAME = "stats_metrics.csv"
 
 # Code related paths
 SAMPLING_FREQ = 125
+SEGMENT_TIME = 5 # in seconds
+
+# Number of segments processed together by the batch functions
+PREPROCESSING_CHUNK_SIZE = 256
+
+# Number of rows read at a time by the chunked dataset loader
+DATASET_CHUNK_SIZE = 65536
+
+# Number of worker processes of the dataset generation, 1 runs it serially
+N_OF_WORKERS = 1
+
+# Number of rows buffered by a result writer before they are written
+RESULT_WRITER_BLOCK_SIZE = 4096
+
+# Chebyshev type I low-pass that removes the high frequency components
+LOW_PASS_FILTER_ORDER = 5
+LOW_PASS_MAX_RIPPLE = 0.5 # in dB
+LOW_PASS_CUT_OFF_FREQ = 10 # in Hz
+
+# Baseline wander removal methods
+MOVING_MEDIAN_BASELINE = "moving median"
+MOVING_MEAN_BASELINE = "moving mean"
+BASELINE_WANDER_METHOD = MOVING_MEDIAN_BASELINE
+
+# Upsampling factor applied by preprocessing and assumed by every module that
+# handles the preprocessed signal. A factor of 1 disables the upsampling.
+UPSAMPLE_FACTOR = 4
+UPSAMPLED_SAMPLING_FREQ = UPSAMPLE_FACTOR * SAMPLING_FREQ
+
+# Resampling methods
+FFT_RESAMPLER = "fft"
+POLYPHASE_RESAMPLER = "polyphase"
+RESAMPLER = FFT_RESAMPLER
+
+# Peak detectors
+AMPD_DETECTOR = "ampd"
+BOUNDED_AMPD_DETECTOR = "bounded ampd"
+LINEAR_DETECTOR = "linear"
+
+# Peak detector used by each module
+NORMALIZATION_PEAK_DETECTOR = AMPD_DETECTOR
+# AMPD keeps a matrix of signal length by half the signal length
+RECORDING_PEAK_DETECTOR = BOUNDED_AMPD_DETECTOR
+# the beats of a segment and of a whole recording are found the same way
+HRV_PEAK_DETECTOR = RECORDING_PEAK_DETECTOR
+LABELS_PEAK_DETECTOR = AMPD_DETECTOR
+
+# Physiological limits used to detect one peak per cardiac cycle
+MIN_BEAT_INTERVAL = 0.33 # in seconds, 180 bpm
+MAX_BEAT_INTERVAL = 1.5 # in seconds, 40 bpm
+MIN_BEAT_RELATIVE_PROMINENCE = 0.3 # fraction of the signal peak to peak amplitude
+# Longest delay between the start of an abp beat and the start of its ppg pulse
+MAX_PULSE_ARRIVAL_DELAY = 0.5 # in seconds
+
+# Heart rate variability
+HRV_WINDOW_TIME = 60 # in seconds, covers a few cycles of the low frequency band
+HRV_MIN_FREQUENCY = 0.005 # in Hz
+HRV_MAX_FREQUENCY = 0.4 # in Hz
+HRV_FREQUENCY_STEP = 0.005 # in Hz
+HRV_LOW_FREQUENCY_BAND = (0.04, 0.15) # in Hz
+HRV_HIGH_FREQUENCY_BAND = (0.15, 0.40) # in Hz
 
 # PPG Signal key points dictionary keys
 SYS_PEAK = "systolic peak"
@@ -42,12 +137,21 @@ MAX_SLP = "max slope"
 DIAS_PEAK = "diastolic peak"
 DIC_NOTCH = "dicrotic notch"
 INFL_POINT = "inflection point"
+# Column order of the key points of a batch of pulses
+KEY_POINTS = [SYS_PEAK, MAX_SLP, DIAS_PEAK, DIC_NOTCH, INFL_POINT]
 
 # Interpolation polynoms orders and coefficients
 ASCENDING_POL_ORDER = 5
 ASCENDING_POL_N_OF_COEFS = ASCENDING_POL_ORDER + 1
 DESCENDING_POL_ORDER = 7
 DESCENDING_POL_N_OF_COEFS = DESCENDING_POL_ORDER + 1
+# Number of (section length, order) pairs whose fitting matrices are cached
+POLYNOMIAL_FIT_CACHE_SIZE = 1024
+
+# Zero crossing directions of the fitted derivative curves
+RISING_CROSSING = "rising"
+FALLING_CROSSING = "falling"
+ANY_CROSSING = "any"
 
 # Polynoms dictionary keys
 ASC_POL = "ascending_pol"
@@ -55,6 +159,8 @@ DESC_POL = "descending_pol"
 ASC_SEC_EVAL = "ascending_section_eval"
 DESC_SEC_EVAL = "descending_section_eval"
 PULSE_EVAL = "pulse_eval"
+MAXIMA = "maxima"
+MINIMA = "minima"
 
 # Features columns
 HEART_RATE = ["Heart rate"]
@@ -98,6 +204,18 @@ NON_LINEAR_FUNCTIONS = [
     "ln(infl_pint_refl_index)",
     "ln(hr * mnpv)"
 ]
+# Feature groups
+HEART_RATE_GROUP = "heart rate"
+MNPV_GROUP = "mnpv"
+AREA_RELATED_GROUP = "area related"
+AMPLITUDE_RELATED_GROUP = "amplitude related"
+TIME_RELATED_GROUP = "time related"
+HRV_GROUP = "hrv"
+NON_LINEAR_GROUP = "non linear"
+# Inputs a feature group can depend on
+PPG_SEGMENT_INPUT = "ppg segment"
+NORMALIZED_PULSE_INPUT = "normalized pulse"
+KEY_POINTS_INPUT = "key points"
 FEATURES_COLUMNS = (
                     HEART_RATE +
                     MNPV +
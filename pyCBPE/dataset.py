@@ -7,34 +7,107 @@ import pyCBPE.constants as consts
 
 def load():
     """ Load dataset from filepat and return it as a pandas dataframe. """
-    df_split_1 = pd.read_csv(consts.FEATURES_AND_LABELS_DF_SPLIT_1_PATH, index_col=False, header=0)
-    df_split_2 = pd.read_csv(consts.FEATURES_AND_LABELS_DF_SPLIT_2_PATH, index_col=False, header=0)
-    df_split_3 = pd.read_csv(consts.FEATURES_AND_LABELS_DF_SPLIT_3_PATH, index_col=False, header=0)
-    df_split_4 = pd.read_csv(consts.FEATURES_AND_LABELS_DF_SPLIT_4_PATH, index_col=False, header=0)
+    # float64 features keep exp(Heart rate) finite
+    features_array, labels_array = load_arrays(features_dtype=np.float64)
 
-    dataframe = pd.concat([df_split_1, df_split_2, df_split_3, df_split_4])
+    dataframe = pd.DataFrame(features_array, columns=consts.FEATURES_COLUMNS)
+    for label_index, label_column in enumerate(consts.LABELS_COLUMNS):
+        dataframe[label_column] = labels_array[:, label_index]
 
-    return dataframe.reset_index(drop=True)
+    return dataframe
+
+
+def iterate_chunks(features_columns=consts.FEATURES_COLUMNS, labels_columns=consts.LABELS_COLUMNS,
+                   chunk_size=consts.DATASET_CHUNK_SIZE, features_dtype=np.float32, paths=None):
+    """ Yield the features and labels arrays of consecutive blocks of at most
+    chunk_size rows of the features and labels files, in the order of paths,
+    which defaults to the four dataset splits.
+
+    Only the given columns are read. Features are cast to features_dtype,
+    where values out of its range, such as exp(Heart rate) in float32,
+    become inf, and labels are int16 with missing labels as -1.
+    """
+    if paths is None:
+        paths = consts.FEATURES_AND_LABELS_DF_SPLITS_PATHS
+    features_columns = list(features_columns)
+    labels_columns = list(labels_columns)
+
+    for path in paths:
+        chunks_reader = pd.read_csv(path, index_col=False, header=0, usecols=features_columns + labels_columns,
+                                    chunksize=chunk_size)
+        for chunk_df in chunks_reader:
+            with np.errstate(over="ignore"):
+                features_array = chunk_df[features_columns].to_numpy(dtype=features_dtype)
+
+            labels_array = chunk_df[labels_columns].to_numpy(dtype=np.float64)
+            labels_array[np.isnan(labels_array)] = -1
+
+            yield features_array, labels_array.astype(np.int16)
+
+
+def load_arrays(features_columns=consts.FEATURES_COLUMNS, labels_columns=consts.LABELS_COLUMNS,
+                chunk_size=consts.DATASET_CHUNK_SIZE, features_dtype=np.float32, paths=None):
+    """ Load the features and labels arrays of every row of the features and
+    labels files, as in iterate_chunks. The rows of the files are counted
+    first, so each array is allocated once and filled chunk by chunk. """
+    if paths is None:
+        paths = consts.FEATURES_AND_LABELS_DF_SPLITS_PATHS
+    n_of_rows = sum(_count_rows(path) for path in paths)
+
+    features_array = np.empty((n_of_rows, len(features_columns)), dtype=features_dtype)
+    labels_array = np.empty((n_of_rows, len(labels_columns)), dtype=np.int16)
+
+    chunk_start = 0
+    for features_chunk, labels_chunk in iterate_chunks(features_columns, labels_columns, chunk_size, features_dtype, paths):
+        chunk_stop = chunk_start + len(features_chunk)
+        features_array[chunk_start:chunk_stop] = features_chunk
+        labels_array[chunk_start:chunk_stop] = labels_chunk
+        chunk_start = chunk_stop
+
+    if chunk_start != n_of_rows:
+        raise ValueError("Expected " + str(n_of_rows) + " rows, read " + str(chunk_start))
+
+    return features_array, labels_array
+
+
+def _count_rows(path):
+    # rows are the lines after the header, the last one may have no newline
+    n_of_lines = 0
+    last_block = b""
+    with open(path, "rb") as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 20), b""):
+            n_of_lines += block.count(b"\n")
+            last_block = block
+
+    if last_block and not last_block.endswith(b"\n"):
+        n_of_lines += 1
+
+    return max(n_of_lines - 1, 0)
 
 
 def handle(dataframe):
     """ Handle dataset values by dropping values that are not going to be
     used. """
-    handled_df = dataframe.copy()
+    # rows with a -1 (TO DO: Change -1 to a constant in constants.py), an inf
+    # or a nan are dropped, checking a column at a time, with a single copy of
+    # the kept rows
+    valid_rows = np.ones(len(dataframe), dtype=bool)
+    for column in dataframe.columns:
+        values = dataframe[column].to_numpy(dtype=np.float64)
+        valid_rows &= np.isfinite(values) & (values != -1)
 
-    handled_df = handled_df.replace(-1, np.nan) # TO DO: Change -1 to a constant in constants.py
-    handled_df = handled_df.replace([np.inf , -np.inf], np.nan)
-    handled_df = handled_df.dropna()
+    handled_df = dataframe.take(np.flatnonzero(valid_rows))
+    handled_df.index = pd.RangeIndex(len(handled_df))
 
     handled_df[consts.HEART_RATE] = handled_df[consts.HEART_RATE].astype(int)
     handled_df[consts.LABELS_COLUMNS] = handled_df[consts.LABELS_COLUMNS].astype(int)
 
-    return handled_df.reset_index(drop=True)
+    return handled_df
 
 
 def remove_outliers(dataframe):
     """ Remove outliers based on labels values. """
-    temp_df = dataframe.copy()
+    temp_df = dataframe
 
     labels_df = temp_df[consts.LABELS_COLUMNS]
 
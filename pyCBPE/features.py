@@ -3,15 +3,12 @@ signal feature extraction. """
 
 import numpy as np
 import scipy.signal
-from pyampd.ampd import find_peaks
-from scipy.interpolate import CubicSpline
-from scipy.signal import cheby1
-from scipy.signal import lfilter
-from scipy.fft import fft
 import pyCBPE.constants as consts
+import pyCBPE.hrv as hrv
 
 
-def extract(sampling_freq, ppg_segment, normalized_ppg_pulse, key_points):
+def extract(sampling_freq, ppg_segment, normalized_ppg_pulse, key_points, upsample_factor=consts.UPSAMPLE_FACTOR,
+            hrv_peak_detector=consts.HRV_PEAK_DETECTOR):
     is_key_points_empty = not bool(key_points)
     if is_key_points_empty:
         features = [-1] * len(consts.FEATURES_COLUMNS)
@@ -19,7 +16,7 @@ def extract(sampling_freq, ppg_segment, normalized_ppg_pulse, key_points):
 
     features = []
 
-    up_sampled_sampling_freq = 4 * sampling_freq
+    up_sampled_sampling_freq = upsample_factor * sampling_freq
 
     # calculate features
     heart_rate = _get_heart_rate(up_sampled_sampling_freq, normalized_ppg_pulse)
@@ -27,7 +24,7 @@ def extract(sampling_freq, ppg_segment, normalized_ppg_pulse, key_points):
     area_related_features = _get_area_related_features(up_sampled_sampling_freq, normalized_ppg_pulse, key_points)
     amplitude_related_features = _get_amplitude_related_features(normalized_ppg_pulse, key_points)
     time_related_features = _get_time_related_features(up_sampled_sampling_freq, normalized_ppg_pulse, key_points)
-    hrv_properties = _get_hrv_properites(sampling_freq, ppg_segment)
+    hrv_properties = _get_hrv_properties(sampling_freq, ppg_segment, hrv_peak_detector)
     non_linear_functions = _get_non_linear_functions(heart_rate, mnpv, amplitude_related_features)
 
     # append features to list
@@ -42,6 +39,311 @@ def extract(sampling_freq, ppg_segment, normalized_ppg_pulse, key_points):
     return features
 
 
+def extract_batch(sampling_freq, ppg_segments, normalized_ppg_pulses, key_points_batch, upsample_factor=consts.UPSAMPLE_FACTOR,
+                  hrv_peak_detector=consts.HRV_PEAK_DETECTOR, hrv_properties=None, columns=None,
+                  dtype=np.float32):
+    """ Features of N segments as an (N, len(columns)) matrix.
+
+    ppg_segments is an (N, segment_length) matrix, normalized_ppg_pulses a
+    list of N pulses of any length and key_points_batch a KeyPointsBatch.
+    The rows of the segments without key points, and the features that
+    could not be calculated, are NaN. The pulses are padded into a single
+    matrix so each feature group is calculated for the whole batch at once.
+    columns selects a subset of FEATURES_COLUMNS, returned in the order of
+    FEATURES_COLUMNS. Only the groups in FEATURE_GROUPS needed by those
+    columns are calculated, and the pulses or key points can be None when
+    none of them depends on it.
+    hrv_properties is an optional (N, len(HRV_PROPERTIES)) matrix, such as
+    the one calculated for a whole recording by hrv.recording_hrv_properties,
+    used instead of the HRV of each isolated segment. Both are calculated by
+    the hrv module, so the HRV columns have the same definition either way.
+    Note that exp(Heart rate) overflows float32 for heart rates above 88
+    bpm, pass a float64 dtype to keep it finite.
+    """
+    columns = _select_columns(columns)
+    feature_groups = _resolve_feature_groups(columns)
+    inputs = set()
+    for feature_group in feature_groups:
+        inputs.update(FEATURE_GROUPS[feature_group].inputs)
+
+    ppg_segments = np.asarray(ppg_segments, dtype=float)
+    n_of_segments = len(ppg_segments)
+    features = np.full((n_of_segments, len(columns)), np.nan)
+
+    is_valid = np.ones(n_of_segments, dtype=bool)
+    if consts.NORMALIZED_PULSE_INPUT in inputs:
+        pulse_lengths = np.array([len(pulse) for pulse in normalized_ppg_pulses], dtype=int)
+        is_valid &= pulse_lengths > 0
+    if consts.KEY_POINTS_INPUT in inputs:
+        is_valid &= key_points_batch.is_valid
+    valid_segments = np.flatnonzero(is_valid)
+    if len(valid_segments) == 0:
+        return features.astype(dtype)
+
+    batch = {
+        "sampling_freq": sampling_freq,
+        "up_sampled_sampling_freq": upsample_factor * sampling_freq,
+        "valid_segments": valid_segments,
+        "ppg_segments": ppg_segments[valid_segments],
+        "hrv_peak_detector": hrv_peak_detector,
+        "hrv_properties": hrv_properties
+    }
+    if consts.NORMALIZED_PULSE_INPUT in inputs:
+        batch["padded_pulses"] = _pad_pulses([normalized_ppg_pulses[segment_index] for segment_index in valid_segments])
+        batch["pulse_lengths"] = pulse_lengths[valid_segments]
+    if consts.KEY_POINTS_INPUT in inputs:
+        batch["key_points_indexes"] = key_points_batch.indexes[valid_segments]
+
+    # calculate features
+    groups_features = {}
+    for feature_group in feature_groups:
+        groups_features[feature_group] = FEATURE_GROUPS[feature_group].calculate(batch, groups_features)
+
+    for column_index, column in enumerate(columns):
+        feature_group, group_column_index = _COLUMNS_GROUPS[column]
+        features[valid_segments, column_index] = groups_features[feature_group][:, group_column_index]
+
+    with np.errstate(over='ignore'):
+        return features.astype(dtype)
+
+
+class FeatureGroup:
+    """ A group of features calculated together for a batch of segments.
+
+    columns are the names of the group features in FEATURES_COLUMNS, inputs
+    the segment data the group reads and dependencies the groups whose
+    values it reuses. calculate receives the batch data and the values of
+    the groups calculated before, and returns one column per feature.
+    """
+
+    __slots__ = ("columns", "inputs", "dependencies", "calculate")
+
+    def __init__(self, columns, inputs, dependencies, calculate):
+        self.columns = columns
+        self.inputs = inputs
+        self.dependencies = dependencies
+        self.calculate = calculate
+
+
+def _select_columns(columns):
+    if columns is None:
+        return list(consts.FEATURES_COLUMNS)
+
+    unknown_columns = set(columns) - set(consts.FEATURES_COLUMNS)
+    if unknown_columns:
+        raise ValueError("Unknown features columns: " + str(sorted(unknown_columns)))
+
+    selected_columns = set(columns)
+
+    return [column for column in consts.FEATURES_COLUMNS if column in selected_columns]
+
+
+def _resolve_feature_groups(columns):
+    # the groups of the columns and their dependencies, in the order of
+    # FEATURE_GROUPS so every group is calculated after its dependencies
+    required_groups = set(_COLUMNS_GROUPS[column][0] for column in columns)
+
+    pending_groups = list(required_groups)
+    while pending_groups:
+        for dependency in FEATURE_GROUPS[pending_groups.pop()].dependencies:
+            if dependency not in required_groups:
+                required_groups.add(dependency)
+                pending_groups.append(dependency)
+
+    return [feature_group for feature_group in FEATURE_GROUPS if feature_group in required_groups]
+
+
+def _calculate_heart_rate(batch, groups_features):
+    heart_rate = np.floor(60 / (batch["pulse_lengths"] / batch["up_sampled_sampling_freq"]))
+
+    return heart_rate[:, np.newaxis]
+
+
+def _calculate_mnpv(batch, groups_features):
+    return _get_batch_mnpv(batch["ppg_segments"])[:, np.newaxis]
+
+
+def _calculate_area_related_features(batch, groups_features):
+    return _get_batch_area_related_features(batch["up_sampled_sampling_freq"], batch["padded_pulses"],
+                                            batch["pulse_lengths"], batch["key_points_indexes"])
+
+
+def _calculate_amplitude_related_features(batch, groups_features):
+    return _get_batch_amplitude_related_features(batch["padded_pulses"], batch["key_points_indexes"])
+
+
+def _calculate_time_related_features(batch, groups_features):
+    return _get_batch_time_related_features(batch["up_sampled_sampling_freq"], batch["padded_pulses"],
+                                            batch["pulse_lengths"], batch["key_points_indexes"])
+
+
+def _calculate_hrv_properties(batch, groups_features):
+    valid_segments = batch["valid_segments"]
+    if batch["hrv_properties"] is not None:
+        return np.asarray(batch["hrv_properties"], dtype=float)[valid_segments]
+
+    hrv_properties = np.zeros((len(valid_segments), len(consts.HRV_PROPERTIES)))
+    for row in range(len(valid_segments)):
+        hrv_properties[row] = hrv.segment_hrv_properties(batch["ppg_segments"][row], batch["sampling_freq"],
+                                                         batch["hrv_peak_detector"])
+
+    return hrv_properties
+
+
+def _calculate_non_linear_functions(batch, groups_features):
+    return _get_batch_non_linear_functions(groups_features[consts.HEART_RATE_GROUP][:, 0],
+                                           groups_features[consts.MNPV_GROUP][:, 0],
+                                           groups_features[consts.AMPLITUDE_RELATED_GROUP])
+
+
+# Registry of the feature groups, in the order of FEATURES_COLUMNS
+FEATURE_GROUPS = {
+    consts.HEART_RATE_GROUP: FeatureGroup(consts.HEART_RATE, [consts.NORMALIZED_PULSE_INPUT], [], _calculate_heart_rate),
+    consts.MNPV_GROUP: FeatureGroup(consts.MNPV, [consts.PPG_SEGMENT_INPUT], [], _calculate_mnpv),
+    consts.AREA_RELATED_GROUP: FeatureGroup(consts.AREA_RELATED_FEATURES, [consts.NORMALIZED_PULSE_INPUT, consts.KEY_POINTS_INPUT], [],
+                                            _calculate_area_related_features),
+    consts.AMPLITUDE_RELATED_GROUP: FeatureGroup(consts.AMPLITUDE_RELATED_FEATURES, [consts.NORMALIZED_PULSE_INPUT, consts.KEY_POINTS_INPUT], [],
+                                                 _calculate_amplitude_related_features),
+    consts.TIME_RELATED_GROUP: FeatureGroup(consts.TIME_RELATED_FEATURES, [consts.NORMALIZED_PULSE_INPUT, consts.KEY_POINTS_INPUT], [],
+                                            _calculate_time_related_features),
+    consts.HRV_GROUP: FeatureGroup(consts.HRV_PROPERTIES, [consts.PPG_SEGMENT_INPUT], [], _calculate_hrv_properties),
+    consts.NON_LINEAR_GROUP: FeatureGroup(consts.NON_LINEAR_FUNCTIONS, [], [consts.HEART_RATE_GROUP, consts.MNPV_GROUP, consts.AMPLITUDE_RELATED_GROUP],
+                                          _calculate_non_linear_functions)
+}
+
+
+def _index_columns_groups(feature_groups):
+    # group and position in the group of each features column
+    columns_groups = {}
+    for feature_group, group in feature_groups.items():
+        for group_column_index, column in enumerate(group.columns):
+            columns_groups[column] = (feature_group, group_column_index)
+
+    return columns_groups
+
+
+_COLUMNS_GROUPS = _index_columns_groups(FEATURE_GROUPS)
+
+
+def _pad_pulses(pulses):
+    padded_pulses = np.full((len(pulses), max(len(pulse) for pulse in pulses)), np.nan)
+    for row, pulse in enumerate(pulses):
+        padded_pulses[row, 0:len(pulse)] = pulse
+
+    return padded_pulses
+
+
+def _key_point_column(key_points_indexes, key):
+    return key_points_indexes[:, consts.KEY_POINTS.index(key)]
+
+
+def _get_batch_mnpv(ppg_segments):
+    Iac = np.max(ppg_segments, axis=1) - np.min(ppg_segments, axis=1)
+    Idc = np.mean(ppg_segments, axis=1)
+    mnpv = Iac / (Iac + Idc)
+
+    return mnpv
+
+
+def _get_batch_area_related_features(sampling_freq, padded_pulses, pulse_lengths, key_points_indexes):
+    max_slope = _key_point_column(key_points_indexes, consts.MAX_SLP)
+    systolic_peak = _key_point_column(key_points_indexes, consts.SYS_PEAK)
+    dicrotic_notch = _key_point_column(key_points_indexes, consts.DIC_NOTCH)
+    inflection_point = _key_point_column(key_points_indexes, consts.INFL_POINT)
+    diastolic_peak = _key_point_column(key_points_indexes, consts.DIAS_PEAK)
+    pulse_start = np.zeros(len(pulse_lengths), dtype=int)
+
+    # the area between any two samples is a difference of the cumulative
+    # integral of the pulse
+    cumulative_areas = _cumulative_trapezoid(sampling_freq, padded_pulses)
+
+    # calculate area related features
+    max_slp_sys_peak_area = _batch_area_between_two_points(cumulative_areas, max_slope, systolic_peak)
+    sys_peak_dic_notch_area = _batch_area_between_two_points(cumulative_areas, systolic_peak, dicrotic_notch)
+    dic_notch_infl_point_area = _batch_area_between_two_points(cumulative_areas, dicrotic_notch, inflection_point)
+    infl_point_dias_peak = _batch_area_between_two_points(cumulative_areas, inflection_point, diastolic_peak)
+    pulse_area = _batch_area_between_two_points(cumulative_areas, pulse_start, pulse_lengths)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        infl_point_area = (_batch_area_between_two_points(cumulative_areas, inflection_point, pulse_lengths - 1) /
+                           _batch_area_between_two_points(cumulative_areas, pulse_start, inflection_point))
+
+    area_related_features = np.column_stack((max_slp_sys_peak_area, sys_peak_dic_notch_area, dic_notch_infl_point_area,
+                                             infl_point_dias_peak, pulse_area, infl_point_area))
+
+    return area_related_features
+
+
+def _batch_area_between_two_points(cumulative_areas, first_points, last_points):
+    # area of the samples first_point to last_point - 1 of each pulse, as
+    # np.trapz over the same slices
+    rows = np.arange(len(cumulative_areas))
+    is_interval_valid = first_points < last_points
+    last_samples = np.where(is_interval_valid, last_points - 1, first_points)
+
+    area = cumulative_areas[rows, last_samples] - cumulative_areas[rows, first_points]
+
+    return np.where(is_interval_valid, area, 0)
+
+
+def _get_batch_amplitude_related_features(padded_pulses, key_points_indexes):
+    amplitude_keys = [consts.MAX_SLP, consts.DIAS_PEAK, consts.DIC_NOTCH, consts.INFL_POINT]
+    amplitude_columns = [consts.KEY_POINTS.index(key) for key in amplitude_keys]
+
+    amplitude_related_features = np.take_along_axis(padded_pulses, key_points_indexes[:, amplitude_columns], axis=1)
+
+    return amplitude_related_features
+
+
+def _get_batch_time_related_features(sampling_freq, padded_pulses, pulse_lengths, key_points_indexes):
+    max_slope = _key_point_column(key_points_indexes, consts.MAX_SLP)
+    systolic_peak = _key_point_column(key_points_indexes, consts.SYS_PEAK)
+    diastolic_peak = _key_point_column(key_points_indexes, consts.DIAS_PEAK)
+    dicrotic_notch = _key_point_column(key_points_indexes, consts.DIC_NOTCH)
+    inflection_point = _key_point_column(key_points_indexes, consts.INFL_POINT)
+
+    # calculate time related features
+    max_slp_sys_peak_lasi = _batch_inverse_of_time_interval(sampling_freq, max_slope, systolic_peak)
+    dias_peak_sys_peak_lasi = _batch_inverse_of_time_interval(sampling_freq, systolic_peak, diastolic_peak)
+    dic_notch_sys_peak_lasi = _batch_inverse_of_time_interval(sampling_freq, systolic_peak, dicrotic_notch)
+    infl_point_sys_peak_lasi = _batch_inverse_of_time_interval(sampling_freq, systolic_peak, inflection_point)
+
+    crest_time = systolic_peak / sampling_freq
+
+    pulse_width = np.array([_get_signal_pulse_width(sampling_freq, pulse[0:pulse_length])
+                            for pulse, pulse_length in zip(padded_pulses, pulse_lengths)])
+
+    time_related_features = np.column_stack((max_slp_sys_peak_lasi, dias_peak_sys_peak_lasi, dic_notch_sys_peak_lasi,
+                                             infl_point_sys_peak_lasi, crest_time, pulse_width))
+
+    return time_related_features
+
+
+def _batch_inverse_of_time_interval(sampling_freq, first_points, last_points):
+    samples_interval = np.where(first_points < last_points, last_points - first_points, 1)
+
+    return np.where(first_points < last_points, sampling_freq / samples_interval, 0)
+
+
+def _get_batch_non_linear_functions(heart_rate, mnpv, amplitude_related_features):
+    # get the reflection indexes from amplitude_related_features
+    dic_notch_reflection_index = amplitude_related_features[:, 2]
+    infl_point_reflection_index = amplitude_related_features[:, 3]
+
+    # calculate non linear function of features
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        non_linear_functions = np.column_stack((
+            np.log(heart_rate),
+            np.exp(heart_rate),
+            np.log(mnpv),
+            np.exp(mnpv),
+            np.log(dic_notch_reflection_index),
+            np.log(infl_point_reflection_index),
+            np.log(heart_rate * mnpv)
+        ))
+
+    return non_linear_functions
+
+
 def _get_heart_rate(sampling_freq, normalized_ppg_pulse):
     heart_rate = np.floor(60 / (len(normalized_ppg_pulse)/sampling_freq))
 
@@ -59,19 +361,18 @@ def _get_mnpv(ppg_segment):
 def _get_area_related_features(sampling_freq, normalized_ppg_pulse, key_points):
     area_related_features = []
 
-    ts = 1 / sampling_freq
-    t = np.linspace(0, len(normalized_ppg_pulse) * ts, num=len(normalized_ppg_pulse), endpoint=False)
-    if (len(normalized_ppg_pulse) != len(t)):
-        area_related_features = [-1] * len(consts.AREA_RELATED_FEATURES)
-        return area_related_features
+    # the area between any two samples is a difference of the cumulative
+    # integral of the pulse
+    cumulative_area = _cumulative_trapezoid(sampling_freq, normalized_ppg_pulse)
+    pulse_length = len(normalized_ppg_pulse)
 
     # calculate area related features
-    max_slp_sys_peak_area = _area_between_two_points(t, normalized_ppg_pulse, key_points[consts.MAX_SLP], key_points[consts.SYS_PEAK])
-    sys_peak_dic_notch_area = _area_between_two_points(t, normalized_ppg_pulse, key_points[consts.SYS_PEAK], key_points[consts.DIC_NOTCH])
-    dic_notch_infl_point_area = _area_between_two_points(t, normalized_ppg_pulse, key_points[consts.DIC_NOTCH], key_points[consts.INFL_POINT])
-    infl_point_dias_peak = _area_between_two_points(t, normalized_ppg_pulse, key_points[consts.INFL_POINT], key_points[consts.DIAS_PEAK])
-    pulse_area = np.trapz(normalized_ppg_pulse, t)
-    infl_point_area = np.trapz(normalized_ppg_pulse[key_points[consts.INFL_POINT]:-1], t[key_points[consts.INFL_POINT]:-1]) / np.trapz(normalized_ppg_pulse[0:key_points[consts.INFL_POINT]], t[0:key_points[consts.INFL_POINT]])
+    max_slp_sys_peak_area = _area_between_two_points(cumulative_area, key_points.max_slope, key_points.systolic_peak)
+    sys_peak_dic_notch_area = _area_between_two_points(cumulative_area, key_points.systolic_peak, key_points.dicrotic_notch)
+    dic_notch_infl_point_area = _area_between_two_points(cumulative_area, key_points.dicrotic_notch, key_points.inflection_point)
+    infl_point_dias_peak = _area_between_two_points(cumulative_area, key_points.inflection_point, key_points.diastolic_peak)
+    pulse_area = _area_between_two_points(cumulative_area, 0, pulse_length)
+    infl_point_area = _area_between_two_points(cumulative_area, key_points.inflection_point, pulse_length - 1) / _area_between_two_points(cumulative_area, 0, key_points.inflection_point)
 
     # append area related features to list
     area_related_features.append(max_slp_sys_peak_area)
@@ -84,10 +385,19 @@ def _get_area_related_features(sampling_freq, normalized_ppg_pulse, key_points):
     return area_related_features
 
 
-def _area_between_two_points(x, y, first_point, last_point):
+def _cumulative_trapezoid(sampling_freq, pulses):
+    # trapezoidal integral from the first sample up to each sample, along
+    # the last axis
+    cumulative_area = np.zeros(pulses.shape)
+    cumulative_area[..., 1:] = np.cumsum((pulses[..., 1:] + pulses[..., 0:-1]) / 2, axis=-1) / sampling_freq
+
+    return cumulative_area
+
+
+def _area_between_two_points(cumulative_area, first_point, last_point):
     area = 0
     if (first_point < last_point):
-        area = np.trapz(y[first_point:last_point], x[first_point:last_point])
+        area = cumulative_area[last_point - 1] - cumulative_area[first_point]
 
     return area
 
@@ -96,10 +406,10 @@ def _get_amplitude_related_features(normalized_ppg_pulse, key_points):
     amplitude_related_features = []
 
     # calculate amplitude related features
-    max_slp_reflection_index = normalized_ppg_pulse[key_points[consts.MAX_SLP]]
-    dias_peak_reflection_index = normalized_ppg_pulse[key_points[consts.DIAS_PEAK]]
-    dic_notch_reflection_index = normalized_ppg_pulse[key_points[consts.DIC_NOTCH]]
-    infl_point_reflection_index = normalized_ppg_pulse[key_points[consts.INFL_POINT]]
+    max_slp_reflection_index = normalized_ppg_pulse[key_points.max_slope]
+    dias_peak_reflection_index = normalized_ppg_pulse[key_points.diastolic_peak]
+    dic_notch_reflection_index = normalized_ppg_pulse[key_points.dicrotic_notch]
+    infl_point_reflection_index = normalized_ppg_pulse[key_points.inflection_point]
 
     # append amplitude related features to list
     amplitude_related_features.append(max_slp_reflection_index)
@@ -117,12 +427,12 @@ def _get_time_related_features(sampling_freq, normalized_ppg_pulse, key_points):
     t = np.linspace(0, len(normalized_ppg_pulse) * ts, num = len(normalized_ppg_pulse), endpoint=False)
 
     # calculate time related features
-    max_slp_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points[consts.MAX_SLP], key_points[consts.SYS_PEAK])
-    dias_peak_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points[consts.SYS_PEAK], key_points[consts.DIAS_PEAK])
-    dic_notch_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points[consts.SYS_PEAK], key_points[consts.DIC_NOTCH])
-    infl_point_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points[consts.SYS_PEAK], key_points[consts.INFL_POINT])
+    max_slp_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points.max_slope, key_points.systolic_peak)
+    dias_peak_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points.systolic_peak, key_points.diastolic_peak)
+    dic_notch_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points.systolic_peak, key_points.dicrotic_notch)
+    infl_point_sys_peak_lasi = _get_inverse_of_time_interval(t, key_points.systolic_peak, key_points.inflection_point)
 
-    crest_time = t[key_points[consts.SYS_PEAK]]
+    crest_time = t[key_points.systolic_peak]
 
     pulse_width = _get_signal_pulse_width(sampling_freq, normalized_ppg_pulse)
 
@@ -159,61 +469,11 @@ def _get_signal_pulse_width(sampling_freq, normalized_ppg_pulse):
     return pulse_width
 
 
-def _get_hrv_properites(sampling_freq, ppg_segment):
-    hrv_properties = []
+def _get_hrv_properties(sampling_freq, ppg_segment, peak_detector=consts.HRV_PEAK_DETECTOR):
+    hrv_properties = hrv.segment_hrv_properties(ppg_segment, sampling_freq, peak_detector)
+    hrv_properties[np.isnan(hrv_properties)] = -1
 
-    ppg_minimals = find_peaks(-ppg_segment)
-    samples_between_pulses = np.diff(ppg_minimals)
-    minimal_to_minimal_interval = samples_between_pulses / sampling_freq
-
-    minimal_to_minimal_cumsum = np.cumsum(minimal_to_minimal_interval)
-    minimal_to_minimal_time_axis = np.subtract(minimal_to_minimal_cumsum, minimal_to_minimal_cumsum[0])
-
-    hrv_sampling_freq = 2.5 # in Hz
-    hrv_sampling_rate = 1 / hrv_sampling_freq
-    interpolation_time = np.linspace(0, len(minimal_to_minimal_time_axis) * hrv_sampling_rate, num = len(minimal_to_minimal_time_axis), endpoint=False)
-
-    if len(minimal_to_minimal_time_axis) < 2:
-        hrv_properties = [-1] * len(consts.HRV_PROPERTIES)
-        return hrv_properties
-
-    cubic_spline_interp = CubicSpline(minimal_to_minimal_time_axis, minimal_to_minimal_interval)
-    hrv = cubic_spline_interp(interpolation_time)
-
-    dc_free_hrv = hrv - np.mean(hrv)
-
-    cut_off_frequency_rad = 0.03 / (hrv_sampling_freq / 2)
-    [b, a] = cheby1(N = 9, rp = 0.5, Wn = cut_off_frequency_rad, btype='high')
-    high_pass_filtered_hrv = lfilter(b, a, dc_free_hrv)
-
-    fft_hrv = fft(high_pass_filtered_hrv)
-    abs_fft_hrv = np.absolute(fft_hrv)
-    psd_hrv = np.power(abs_fft_hrv, 2)
-    n_of_psd_samples = len(psd_hrv)
-
-    # to do: consider adapting this to use np.linspace
-    psd_frequency_axis = np.arange(0, hrv_sampling_freq / 2, hrv_sampling_freq / (2*n_of_psd_samples))
-
-    low_frequency = (0.04 < psd_frequency_axis) & (psd_frequency_axis < 0.15)
-    high_frequency = (0.15 < psd_frequency_axis) & (psd_frequency_axis < 0.40)
-
-    # calculate hrv properties
-    mean_hrv = np.mean(hrv)
-    std_hrv = np.std(hrv)
-    hrv_total_power = sum(psd_hrv)
-    hrv_low_frequency = sum(psd_hrv[low_frequency]) / hrv_total_power
-    hrv_high_frequency = sum(psd_hrv[high_frequency]) / hrv_total_power
-    hrv_low_freq_high_freq_ratio = hrv_low_frequency / hrv_high_frequency
-
-    # append hrv properties to list
-    hrv_properties.append(mean_hrv)
-    hrv_properties.append(std_hrv)
-    hrv_properties.append(hrv_total_power)
-    hrv_properties.append(hrv_low_frequency)
-    hrv_properties.append(hrv_high_frequency)
-    hrv_properties.append(hrv_low_freq_high_freq_ratio)
-
-    return hrv_properties
+    return hrv_properties.tolist()
 
 
 def _get_non_linear_functions(heart_rate, mnpv, amplitude_related_features):
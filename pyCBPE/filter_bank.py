@@ -0,0 +1,44 @@
+""" This is the package responsible for designing the digital filters used in
+pyCBPE. Each filter is designed once per sampling rate and specification. """
+
+from functools import lru_cache
+import numpy as np
+from scipy import signal
+
+
+def chebyshev_type_1(filter_order, max_ripple, cut_off_freq_hz, sampling_freq, btype):
+    """ Get a Chebyshev type I filter as second-order sections.
+
+    The returned array is shared between callers and must not be modified.
+    Use it with scipy.signal.sosfilt or scipy.signal.sosfiltfilt.
+    """
+    return _design_chebyshev_type_1(filter_order, max_ripple, cut_off_freq_hz, sampling_freq, btype)
+
+
+@lru_cache(maxsize=None)
+def _design_chebyshev_type_1(filter_order, max_ripple, cut_off_freq_hz, sampling_freq, btype):
+    second_order_sections = signal.cheby1(filter_order, max_ripple, cut_off_freq_hz, btype=btype,
+                                          output='sos', fs=sampling_freq)
+
+    return second_order_sections
+
+
+def interpolation_fir(upsample_factor):
+    """ Get the low-pass FIR taps used to interpolate a zero-stuffed signal.
+
+    The taps follow the default design of scipy.signal.resample_poly and
+    include the gain that compensates the inserted zeros.
+    """
+    return _design_interpolation_fir(upsample_factor)
+
+
+@lru_cache(maxsize=None)
+def _design_interpolation_fir(upsample_factor):
+    if upsample_factor == 1:
+        # no interpolation needed, the filter is the identity
+        return np.ones(1)
+
+    half_length = 10 * upsample_factor
+    fir_taps = signal.firwin(2 * half_length + 1, 1 / upsample_factor, window=('kaiser', 5.0))
+
+    return upsample_factor * fir_taps
@@ -0,0 +1,167 @@
+""" This is the package responsible for calculating the heart rate
+variability properties of long photoplethysmogram recordings. """
+
+from collections import deque
+import numpy as np
+import pyCBPE.constants as consts
+import pyCBPE.peak_detection as peak_detection
+
+
+def recording_hrv_properties(ppg_recording, sampling_freq=consts.SAMPLING_FREQ, segment_time=consts.SEGMENT_TIME,
+                             window_time=consts.HRV_WINDOW_TIME, peak_detector=consts.HRV_PEAK_DETECTOR):
+    """ HRV properties of each consecutive segment of a whole recording.
+
+    The beats are detected once on the recording, as the minima of the ppg
+    signal, instead of once per segment. Returns an (n_of_segments,
+    len(HRV_PROPERTIES)) matrix in the order of features.extract_batch.
+    """
+    ppg_recording = np.asarray(ppg_recording, dtype=float)
+    segment_length = int(segment_time * sampling_freq)
+    n_of_segments = len(ppg_recording) // segment_length
+
+    beat_indexes = peak_detection.find_beats(-ppg_recording, sampling_freq, peak_detector)
+
+    return segments_hrv_properties(beat_indexes, sampling_freq, n_of_segments, segment_length, window_time)
+
+
+def segment_hrv_properties(ppg_segment, sampling_freq=consts.SAMPLING_FREQ, peak_detector=consts.HRV_PEAK_DETECTOR):
+    """ HRV properties of an isolated segment, calculated as the ones of a
+    recording whose window only holds the beats of that segment. """
+    ppg_segment = np.asarray(ppg_segment, dtype=float)
+    beat_indexes = peak_detection.find_beats(-ppg_segment, sampling_freq, peak_detector)
+
+    return segments_hrv_properties(beat_indexes, sampling_freq, 1, len(ppg_segment))[0]
+
+
+def segments_hrv_properties(beat_indexes, sampling_freq, n_of_segments, segment_length, window_time=consts.HRV_WINDOW_TIME):
+    """ HRV properties at the end of each consecutive segment of a recording.
+
+    The properties of a segment are calculated on the RR intervals of the
+    window_time seconds that end with it. The windows of consecutive
+    segments overlap, so a RollingHrv only adds the beats of the new
+    segment and drops the ones that left the window.
+    """
+    beat_times = np.sort(np.asarray(beat_indexes)) / sampling_freq
+    hrv_properties = np.full((n_of_segments, len(consts.HRV_PROPERTIES)), np.nan)
+
+    rolling_hrv = RollingHrv(window_time)
+    next_beat = 0
+    for segment_index in range(n_of_segments):
+        segment_end_time = (segment_index + 1) * segment_length / sampling_freq
+        last_beat = np.searchsorted(beat_times, segment_end_time)
+
+        rolling_hrv.add_beats(beat_times[next_beat:last_beat])
+        rolling_hrv.advance(segment_end_time)
+        next_beat = last_beat
+
+        hrv_properties[segment_index] = rolling_hrv.properties()
+
+    return hrv_properties
+
+
+class RollingHrv:
+    """ HRV properties of the RR intervals of a sliding time window.
+
+    The spectrum is a Lomb-Scargle periodogram of the RR intervals at their
+    beat times, so they are not interpolated nor filtered. Every sum the
+    periodogram needs is kept per frequency and updated when a beat enters
+    or leaves the window, which costs O(frequencies) per beat instead of a
+    new spectral estimation per window.
+    """
+
+    def __init__(self, window_time=consts.HRV_WINDOW_TIME):
+        self._window_time = window_time
+
+        frequencies = np.arange(consts.HRV_MIN_FREQUENCY, consts.HRV_MAX_FREQUENCY + consts.HRV_FREQUENCY_STEP / 2,
+                                consts.HRV_FREQUENCY_STEP)
+        self._angular_frequencies = 2 * np.pi * frequencies
+        self._low_frequency = (consts.HRV_LOW_FREQUENCY_BAND[0] < frequencies) & (frequencies < consts.HRV_LOW_FREQUENCY_BAND[1])
+        self._high_frequency = (consts.HRV_HIGH_FREQUENCY_BAND[0] < frequencies) & (frequencies < consts.HRV_HIGH_FREQUENCY_BAND[1])
+
+        self._intervals = deque()
+        self._last_beat_time = None
+        self._reset_sums()
+
+    def add_beats(self, beat_times):
+        for beat_time in np.asarray(beat_times, dtype=float).tolist():
+            if self._last_beat_time is not None:
+                interval = beat_time - self._last_beat_time
+                self._intervals.append((beat_time, interval))
+                self._update_sums(beat_time, interval, 1)
+
+            self._last_beat_time = beat_time
+
+    def advance(self, window_end_time):
+        window_start_time = window_end_time - self._window_time
+        while self._intervals and self._intervals[0][0] < window_start_time:
+            beat_time, interval = self._intervals.popleft()
+            self._update_sums(beat_time, interval, -1)
+
+        # start again from exact zeros instead of accumulating rounding errors
+        if not self._intervals:
+            self._reset_sums()
+
+    def properties(self):
+        n_of_intervals = len(self._intervals)
+        if n_of_intervals < 2:
+            return np.full(len(consts.HRV_PROPERTIES), np.nan)
+
+        mean_hrv = self._interval_sum / n_of_intervals
+        std_hrv = np.sqrt(max(self._squared_interval_sum / n_of_intervals - mean_hrv ** 2, 0))
+
+        psd_hrv = self._periodogram(n_of_intervals, mean_hrv)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hrv_total_power = np.sum(psd_hrv)
+            hrv_low_frequency = np.sum(psd_hrv[self._low_frequency]) / hrv_total_power
+            hrv_high_frequency = np.sum(psd_hrv[self._high_frequency]) / hrv_total_power
+            hrv_low_freq_high_freq_ratio = hrv_low_frequency / hrv_high_frequency
+
+        return np.array([mean_hrv, std_hrv, hrv_total_power, hrv_low_frequency, hrv_high_frequency,
+                         hrv_low_freq_high_freq_ratio])
+
+    def _reset_sums(self):
+        n_of_frequencies = len(self._angular_frequencies)
+
+        self._interval_sum = 0.0
+        self._squared_interval_sum = 0.0
+        self._cos_sum = np.zeros(n_of_frequencies)
+        self._sin_sum = np.zeros(n_of_frequencies)
+        self._interval_cos_sum = np.zeros(n_of_frequencies)
+        self._interval_sin_sum = np.zeros(n_of_frequencies)
+        self._double_cos_sum = np.zeros(n_of_frequencies)
+        self._double_sin_sum = np.zeros(n_of_frequencies)
+
+    def _update_sums(self, beat_time, interval, sign):
+        phase = self._angular_frequencies * beat_time
+        cos_phase = np.cos(phase)
+        sin_phase = np.sin(phase)
+
+        self._interval_sum += sign * interval
+        self._squared_interval_sum += sign * interval ** 2
+        self._cos_sum += sign * cos_phase
+        self._sin_sum += sign * sin_phase
+        self._interval_cos_sum += sign * interval * cos_phase
+        self._interval_sin_sum += sign * interval * sin_phase
+        self._double_cos_sum += sign * (cos_phase ** 2 - sin_phase ** 2)
+        self._double_sin_sum += sign * 2 * sin_phase * cos_phase
+
+    def _periodogram(self, n_of_intervals, mean_interval):
+        # Lomb-Scargle periodogram of the mean free intervals written in
+        # terms of the sums over the window
+        interval_cos = self._interval_cos_sum - mean_interval * self._cos_sum
+        interval_sin = self._interval_sin_sum - mean_interval * self._sin_sum
+
+        double_time_offset_phase = np.arctan2(self._double_sin_sum, self._double_cos_sum)
+        cos_offset = np.cos(double_time_offset_phase / 2)
+        sin_offset = np.sin(double_time_offset_phase / 2)
+
+        double_projection = self._double_cos_sum * np.cos(double_time_offset_phase) + self._double_sin_sum * np.sin(double_time_offset_phase)
+        cos_squared_sum = (n_of_intervals + double_projection) / 2
+        sin_squared_sum = (n_of_intervals - double_projection) / 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            psd = 0.5 * ((interval_cos * cos_offset + interval_sin * sin_offset) ** 2 / cos_squared_sum +
+                         (interval_sin * cos_offset - interval_cos * sin_offset) ** 2 / sin_squared_sum)
+
+        return np.nan_to_num(psd)
@@ -0,0 +1,74 @@
+""" This is the package responsible for reading the records of the original
+dataset files and cutting them into the segments of a segment store. """
+
+import h5py
+import numpy as np
+import pyCBPE.constants as consts
+import pyCBPE.segment_store as segment_store
+import pyCBPE.sharding as sharding
+
+
+def iterate_records(mat_path, part_name, record_start=0, record_stop=None):
+    """ Yield the index, ppg recording and abp recording of each record of a
+    Part_N.mat file from record_start to record_stop, one record at a time.
+
+    The v7.3 mat files are HDF5 files where the part is a cell array of
+    references to one (n_of_samples, n_of_signals) dataset per record, so
+    only the ppg and abp columns of the current record are in memory.
+    """
+    with h5py.File(mat_path, "r") as mat_file:
+        record_references = mat_file[part_name][()].ravel()
+
+        for record_index in range(record_start, len(record_references) if record_stop is None else record_stop):
+            record = mat_file[record_references[record_index]]
+            ppg_recording = record[:, consts.MAT_PPG_COLUMN]
+            abp_recording = record[:, consts.MAT_ABP_COLUMN]
+
+            yield record_index, ppg_recording, abp_recording
+
+
+def count_records(mat_path, part_name):
+    with h5py.File(mat_path, "r") as mat_file:
+        return mat_file[part_name].size
+
+
+def segment_recording(recording, segment_length):
+    """ (n_of_segments, segment_length) view of the whole segments of a
+    recording. The samples after the last whole segment are dropped and no
+    sample is copied. """
+    recording = np.asarray(recording)
+    n_of_segments = len(recording) // segment_length
+
+    return recording[0:n_of_segments * segment_length].reshape(n_of_segments, segment_length)
+
+
+def ingest_part(mat_path, part_name, segment_store_path, sampling_freq=consts.SAMPLING_FREQ,
+                segment_time=consts.SEGMENT_TIME, shard=None):
+    """ Write the segments of every record of a Part_N.mat file to a segment
+    store and return the number of segments written.
+
+    shard is an optional (shard_index, n_of_shards) that only writes the
+    records of that shard, whose range is kept in the store header so
+    sharding.merge_segment_stores can check the shards of a part.
+    """
+    segment_length = int(segment_time * sampling_freq)
+
+    record_start, record_stop = 0, None
+    shard_header = None
+    if shard is not None:
+        n_of_records = count_records(mat_path, part_name)
+        record_start, record_stop = sharding.shard_range(n_of_records, *shard)
+        shard_header = {"index": shard[0], "n_of_shards": shard[1], "record_start": record_start, "record_stop": record_stop,
+                        "n_of_records": n_of_records}
+
+    with segment_store.SegmentStoreWriter(segment_store_path, sampling_freq, segment_length, shard=shard_header) as segment_store_writer:
+        for record_index, ppg_recording, abp_recording in iterate_records(mat_path, part_name, record_start, record_stop):
+            segments = {
+                consts.PPG_SIGNAL: segment_recording(ppg_recording, segment_length),
+                consts.ABP_SIGNAL: segment_recording(abp_recording, segment_length)
+            }
+            segment_store_writer.write_segments(part_name + "_" + str(record_index), segments)
+
+        n_of_segments = segment_store_writer.n_of_segments
+
+    return n_of_segments
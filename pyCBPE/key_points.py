@@ -2,51 +2,128 @@
 pulse key points extraction. """
 
 import numpy as np
-import pyampd
 import pyCBPE.constants as consts
+import pyCBPE.polynomial_fitting as polynomial_fitting
 
 
-def extract(normalized_pulse):
+class KeyPoints:
+    """ Sample indexes of the key points of a normalized pulse.
+
+    The key points can also be read with the key point names in constants,
+    as the dictionaries returned before. A KeyPoints is false when the key
+    points could not be detected.
+    """
+
+    __slots__ = ("systolic_peak", "max_slope", "diastolic_peak", "dicrotic_notch", "inflection_point")
+
+    def __init__(self, systolic_peak=0, max_slope=0, diastolic_peak=0, dicrotic_notch=0, inflection_point=0):
+        self.systolic_peak = systolic_peak
+        self.max_slope = max_slope
+        self.diastolic_peak = diastolic_peak
+        self.dicrotic_notch = dicrotic_notch
+        self.inflection_point = inflection_point
+
+    def __getitem__(self, key):
+        return getattr(self, _ATTRIBUTES_BY_KEY[key])
+
+    def __bool__(self):
+        # a key point is never detected at the first sample of the pulse
+        return bool(self.systolic_peak and self.max_slope and self.diastolic_peak and self.dicrotic_notch
+                    and self.inflection_point)
+
+    def __repr__(self):
+        return "KeyPoints(" + ", ".join(attribute + "=" + str(getattr(self, attribute)) for attribute in self.__slots__) + ")"
+
+    def to_array(self):
+        return np.array([getattr(self, attribute) for attribute in self.__slots__], dtype=np.int32)
+
+
+class KeyPointsBatch:
+    """ Key points of N pulses.
+
+    indexes is an (N, 5) int32 matrix with the columns in the order of
+    consts.KEY_POINTS and is_valid masks the pulses whose key points were
+    detected. The rows of invalid pulses are zero.
+    """
+
+    __slots__ = ("indexes", "is_valid")
+
+    def __init__(self, n_of_pulses):
+        self.indexes = np.zeros((n_of_pulses, len(consts.KEY_POINTS)), dtype=np.int32)
+        self.is_valid = np.zeros(n_of_pulses, dtype=bool)
+
+    @classmethod
+    def from_key_points(cls, key_points_list):
+        key_points_batch = cls(len(key_points_list))
+        for pulse_index, key_points in enumerate(key_points_list):
+            key_points_batch[pulse_index] = key_points
+
+        return key_points_batch
+
+    @classmethod
+    def from_arrays(cls, indexes, is_valid):
+        key_points_batch = cls(0)
+        key_points_batch.indexes = np.asarray(indexes, dtype=np.int32)
+        key_points_batch.is_valid = np.asarray(is_valid, dtype=bool)
+
+        return key_points_batch
+
+    def __len__(self):
+        return len(self.is_valid)
+
+    def __getitem__(self, pulse_index):
+        if not self.is_valid[pulse_index]:
+            return KeyPoints()
+
+        return KeyPoints(*self.indexes[pulse_index].tolist())
+
+    def __setitem__(self, pulse_index, key_points):
+        self.is_valid[pulse_index] = bool(key_points)
+        if self.is_valid[pulse_index]:
+            self.indexes[pulse_index] = key_points.to_array()
+        else:
+            self.indexes[pulse_index] = 0
+
+    def column(self, key):
+        return self.indexes[:, consts.KEY_POINTS.index(key)]
+
+
+_ATTRIBUTES_BY_KEY = dict(zip(consts.KEY_POINTS, KeyPoints.__slots__))
+
+
+def extract(normalized_pulse, upsample_factor=consts.UPSAMPLE_FACTOR):
+    key_points = KeyPoints()
+
     is_normalized_pulse_empty = normalized_pulse.size == 0
     if is_normalized_pulse_empty:
-        key_points = {}
         return key_points
 
-    # group all key points in this dictionary
-    key_points = {
-        consts.SYS_PEAK: 0,
-        consts.MAX_SLP: 0,
-        consts.DIAS_PEAK: 0,
-        consts.DIC_NOTCH: 0,
-        consts.INFL_POINT: 0
-    }
+    key_points.systolic_peak = _find_systolic_peak_location(normalized_pulse)
+    if key_points.systolic_peak == 0:
+        return KeyPoints()
 
-    key_points[consts.SYS_PEAK] = _find_systolic_peak_location(normalized_pulse)
-    if key_points[consts.SYS_PEAK] == 0:
-        key_points = {}
-        return key_points
+    sampling_freq = upsample_factor * consts.SAMPLING_FREQ
 
-    regular_pulse, pulse_first_derivative, pulse_second_derivative = _fit_section_polynoms(normalized_pulse, key_points[consts.SYS_PEAK])
+    regular_pulse, pulse_first_derivative, pulse_second_derivative = _fit_section_polynoms(sampling_freq, normalized_pulse, key_points.systolic_peak)
+    # the derivatives extrema are searched once and shared by every key point
+    _index_extrema(pulse_first_derivative)
+    _index_extrema(pulse_second_derivative)
 
-    key_points[consts.MAX_SLP] = _find_max_slope(pulse_first_derivative, key_points)
-    if key_points[consts.MAX_SLP] == 0:
-        key_points = {}
-        return key_points
+    key_points.max_slope = _find_max_slope(pulse_first_derivative, key_points)
+    if key_points.max_slope == 0:
+        return KeyPoints()
 
-    key_points[consts.DIAS_PEAK] = _find_diastolic_peak(pulse_first_derivative, pulse_second_derivative, key_points)
-    if key_points[consts.DIAS_PEAK] == 0:
-        key_points = {}
-        return key_points
+    key_points.diastolic_peak = _find_diastolic_peak(pulse_first_derivative, pulse_second_derivative, key_points)
+    if key_points.diastolic_peak == 0:
+        return KeyPoints()
 
-    key_points[consts.DIC_NOTCH] = _find_dicrotic_notch(pulse_second_derivative, key_points)
-    if key_points[consts.DIC_NOTCH] == 0:
-        key_points = {}
-        return key_points
+    key_points.dicrotic_notch = _find_dicrotic_notch(pulse_second_derivative, key_points)
+    if key_points.dicrotic_notch == 0:
+        return KeyPoints()
 
-    key_points[consts.INFL_POINT] = _find_inflection_point(pulse_second_derivative, key_points)
-    if key_points[consts.INFL_POINT] == 0:
-        key_points = {}
-        return key_points
+    key_points.inflection_point = _find_inflection_point(pulse_second_derivative, key_points)
+    if key_points.inflection_point == 0:
+        return KeyPoints()
 
     return key_points
 
@@ -66,75 +143,58 @@ def _find_systolic_peak_location(normalized_pulse):
     return systolic_peak
 
 
-def _fit_section_polynoms(normalized_pulse, systolic_peak):
-    pulse_length = len(normalized_pulse)
-    up_sampled_rate = 1 / (4*consts.SAMPLING_FREQ)
-    pulse_time = np.linspace(0, pulse_length * up_sampled_rate, num = pulse_length, endpoint=False)
-
+def _fit_section_polynoms(sampling_freq, normalized_pulse, systolic_peak):
     ascending_section, descending_section = _separate_pulse_in_sections(normalized_pulse, systolic_peak)
 
-    ascending_len = len(ascending_section)
-    descending_len = len(descending_section)
+    # the polynoms of each section are fitted with the time starting at the
+    # first sample of the section
+    ascending_fit = polynomial_fitting.fit_sections(ascending_section, consts.ASCENDING_POL_ORDER, sampling_freq)
+    descending_fit = polynomial_fitting.fit_sections(descending_section, consts.DESCENDING_POL_ORDER, sampling_freq)
+    ascending_pol, ascending_eval, ascending_first_derivative_eval, ascending_second_derivative_eval = ascending_fit
+    descending_pol, descending_eval, descending_first_derivative_eval, descending_second_derivative_eval = descending_fit
 
-    # prealocation
+    ###### without derivative ######
     regular_pulse = {
-        consts.ASC_POL : np.zeros(consts.ASCENDING_POL_N_OF_COEFS),
-        consts.DESC_POL : np.zeros(consts.DESCENDING_POL_N_OF_COEFS),
-        consts.ASC_SEC_EVAL : np.zeros(ascending_len),
-        consts.DESC_SEC_EVAL : np.zeros(descending_len),
-        consts.PULSE_EVAL: np.zeros(ascending_len + descending_len - 1)
+        consts.ASC_POL: ascending_pol[0],
+        consts.DESC_POL: descending_pol[0],
+        consts.ASC_SEC_EVAL: ascending_eval[0],
+        consts.DESC_SEC_EVAL: descending_eval[0],
+        # concatenate sections polynoms
+        consts.PULSE_EVAL: np.concatenate((ascending_eval[0, 0:-1], descending_eval[0]))
     }
 
+    ###### first derivative ######
     pulse_first_derivative = {
-        consts.ASC_POL : np.zeros(consts.ASCENDING_POL_N_OF_COEFS),
-        consts.DESC_POL : np.zeros(consts.DESCENDING_POL_N_OF_COEFS),
-        consts.ASC_SEC_EVAL : np.zeros(ascending_len),
-        consts.DESC_SEC_EVAL : np.zeros(descending_len),
-        consts.PULSE_EVAL: np.zeros(ascending_len + descending_len - 1)
+        consts.ASC_POL: polynomial_fitting.derivative_coefficients(ascending_pol[0]),
+        consts.DESC_POL: polynomial_fitting.derivative_coefficients(descending_pol[0]),
+        consts.ASC_SEC_EVAL: ascending_first_derivative_eval[0],
+        consts.DESC_SEC_EVAL: descending_first_derivative_eval[0],
+        # concatenate first derivates sections polynoms
+        consts.PULSE_EVAL: np.concatenate((ascending_first_derivative_eval[0, 0:-1], descending_first_derivative_eval[0]))
     }
 
+    ###### second derivative ######
     pulse_second_derivative = {
-        consts.ASC_POL : np.zeros(consts.ASCENDING_POL_N_OF_COEFS),
-        consts.DESC_POL : np.zeros(consts.DESCENDING_POL_N_OF_COEFS),
-        consts.ASC_SEC_EVAL : np.zeros(ascending_len),
-        consts.DESC_SEC_EVAL : np.zeros(descending_len),
-        consts.PULSE_EVAL: np.zeros(ascending_len + descending_len - 1)
+        consts.ASC_POL: polynomial_fitting.derivative_coefficients(pulse_first_derivative[consts.ASC_POL]),
+        consts.DESC_POL: polynomial_fitting.derivative_coefficients(pulse_first_derivative[consts.DESC_POL]),
+        consts.ASC_SEC_EVAL: ascending_second_derivative_eval[0],
+        consts.DESC_SEC_EVAL: descending_second_derivative_eval[0],
+        # concatenate second derivatives sections polynoms
+        consts.PULSE_EVAL: np.concatenate((ascending_second_derivative_eval[0, 0:-1], descending_second_derivative_eval[0]))
     }
 
-    ascending_time = pulse_time[0:systolic_peak + 1]
-    descending_time = pulse_time[systolic_peak: len(pulse_time)]
-
-    ###### without derivative ######
-    # fit sections polynoms
-    regular_pulse[consts.ASC_POL] = np.polyfit(ascending_time, ascending_section, deg=5)
-    regular_pulse[consts.DESC_POL] = np.polyfit(descending_time, descending_section, deg=7)
-    # evaluate sections polynoms
-    regular_pulse[consts.ASC_SEC_EVAL] = np.polyval(regular_pulse[consts.ASC_POL], ascending_time)
-    regular_pulse[consts.DESC_SEC_EVAL] = np.polyval(regular_pulse[consts.DESC_POL], descending_time)
-    # concatenate sections polynoms
-    regular_pulse[consts.PULSE_EVAL] = np.concatenate((regular_pulse[consts.ASC_SEC_EVAL][0:-1], regular_pulse[consts.DESC_SEC_EVAL]))
+    return regular_pulse, pulse_first_derivative, pulse_second_derivative
 
-    ###### first derivative ######
-    # fit sections first derivatives polynoms
-    pulse_first_derivative[consts.ASC_POL] = np.polyder(regular_pulse[consts.ASC_POL])
-    pulse_first_derivative[consts.DESC_POL] = np.polyder(regular_pulse[consts.DESC_POL])
-    # evaluate sections first derivatives polynoms
-    pulse_first_derivative[consts.ASC_SEC_EVAL] = np.polyval(pulse_first_derivative[consts.ASC_POL], ascending_time)
-    pulse_first_derivative[consts.DESC_SEC_EVAL] = np.polyval(pulse_first_derivative[consts.DESC_POL], descending_time)
-    # concatenate first derivates sections polynoms
-    pulse_first_derivative[consts.PULSE_EVAL] = np.concatenate((pulse_first_derivative[consts.ASC_SEC_EVAL][0:-1], pulse_first_derivative[consts.DESC_SEC_EVAL]))
 
-    ###### second derivative ######
-    # fit sections second derivatives polynoms
-    pulse_second_derivative[consts.ASC_POL] = np.polyder(pulse_first_derivative[consts.ASC_POL])
-    pulse_second_derivative[consts.DESC_POL] = np.polyder(pulse_first_derivative[consts.DESC_POL])
-    # evaluate sections second derivatives polynoms
-    pulse_second_derivative[consts.ASC_SEC_EVAL] = np.polyval(pulse_second_derivative[consts.ASC_POL], ascending_time)
-    pulse_second_derivative[consts.DESC_SEC_EVAL] = np.polyval(pulse_second_derivative[consts.DESC_POL], descending_time)
-    # concatenate second derivatives sections polynoms
-    pulse_second_derivative[consts.PULSE_EVAL] = np.concatenate((pulse_second_derivative[consts.ASC_SEC_EVAL][0:-1], pulse_second_derivative[consts.DESC_SEC_EVAL]))
+def _index_extrema(pulse_polynom):
+    # each section is searched on its own, so the junction of the two
+    # polynoms at the systolic peak is never taken as an extremum
+    ascending_maxima, ascending_minima = polynomial_fitting.find_local_extrema(pulse_polynom[consts.ASC_SEC_EVAL])
+    descending_maxima, descending_minima = polynomial_fitting.find_local_extrema(pulse_polynom[consts.DESC_SEC_EVAL])
+    descending_offset = len(pulse_polynom[consts.ASC_SEC_EVAL]) - 1
 
-    return regular_pulse, pulse_first_derivative, pulse_second_derivative
+    pulse_polynom[consts.MAXIMA] = np.concatenate((np.flatnonzero(ascending_maxima[0]), np.flatnonzero(descending_maxima[0]) + descending_offset))
+    pulse_polynom[consts.MINIMA] = np.concatenate((np.flatnonzero(ascending_minima[0]), np.flatnonzero(descending_minima[0]) + descending_offset))
 
 
 # todo: change this to receive key_points dict
@@ -148,8 +208,8 @@ def _separate_pulse_in_sections(normalized_pulse, systolic_peak):
 def _find_max_slope(pulse_first_derivative, key_points):
     max_slope = 0 # always returns 0 if the key point hasn't been detected
 
-    maximals = pyampd.ampd.find_peaks(pulse_first_derivative[consts.PULSE_EVAL])
-    maximals_before_sys_peak = maximals[maximals < key_points[consts.SYS_PEAK]]
+    maximals = pulse_first_derivative[consts.MAXIMA]
+    maximals_before_sys_peak = maximals[maximals < key_points.systolic_peak]
 
     if (len(maximals_before_sys_peak) > 0):
         max_slope = maximals_before_sys_peak[0]
@@ -164,47 +224,37 @@ def _find_max_slope(pulse_first_derivative, key_points):
 def _find_diastolic_peak(pulse_first_derivative, pulse_second_derivative, key_points):
     diastolic_peak = 0 # always returns 0 if the key point hasn't been detected
     ppg_pulse_second_derivative = pulse_second_derivative[consts.PULSE_EVAL]
-    ts = np.round(1/(4*consts.SAMPLING_FREQ), 3)
-    t = np.linspace(0, len(ppg_pulse_second_derivative) * ts, num=len(ppg_pulse_second_derivative), endpoint=False)
 
-    if len(ppg_pulse_second_derivative) != len(t):
+    # the second derivative minimum of the diastolic peak follows the
+    # maximum of the dicrotic notch
+    second_derivative_maximals = pulse_second_derivative[consts.MAXIMA]
+    second_derivative_max_after_sys_peak = second_derivative_maximals[second_derivative_maximals > key_points.systolic_peak]
+
+    if len(second_derivative_max_after_sys_peak) > 0:
+        second_derivative_minimals = pulse_second_derivative[consts.MINIMA]
+        second_derivative_min_after_dic_notch = second_derivative_minimals[second_derivative_minimals > second_derivative_max_after_sys_peak[0]]
+
+        if len(second_derivative_min_after_dic_notch) > 0:
+            # Validate if we should get the first or the last minimal
+            diastolic_peak = second_derivative_min_after_dic_notch[0]
+
+    # the diastolic wave starts where the first derivative rises through zero
+    # after the systolic peak and peaks where it falls through zero again
+    pulse_length = len(ppg_pulse_second_derivative)
+    diastolic_wave_start = polynomial_fitting.find_zero_crossings(pulse_first_derivative[consts.PULSE_EVAL],
+                                                                  key_points.systolic_peak + 1, pulse_length,
+                                                                  consts.RISING_CROSSING)[0]
+    if diastolic_wave_start < 0:
         return diastolic_peak
 
-    second_derivative_minimals = pyampd.ampd.find_peaks(-ppg_pulse_second_derivative)
-    second_derivative_min_after_sys_peak = second_derivative_minimals[second_derivative_minimals > key_points[consts.SYS_PEAK]]
-
-    if len(second_derivative_min_after_sys_peak) > 0:
-        # Validate if we should get the first or the last minimal
-        diastolic_peak = second_derivative_min_after_sys_peak[0]
-
-    first_derivative_roots = np.roots(pulse_first_derivative[consts.DESC_POL])
-    positive_roots = first_derivative_roots[first_derivative_roots > 0]
-
-    is_complex = np.iscomplex(positive_roots)
-    if all(is_complex):
+    first_derivative_root = polynomial_fitting.find_zero_crossings(pulse_first_derivative[consts.PULSE_EVAL],
+                                                                   diastolic_wave_start, pulse_length,
+                                                                   consts.FALLING_CROSSING)[0]
+    if first_derivative_root < 0:
         return diastolic_peak
 
-    is_real = np.isreal(positive_roots)
-    real_roots = positive_roots[is_real]
-    first_real_root = real_roots[0]
-
-    min_root = first_real_root - ts/2
-    max_root = first_real_root + ts/2
-
-    is_greater_than_min = t > min_root
-    is_less_than_max = t < max_root
-
-    value_index = is_greater_than_min & is_less_than_max
-    if not any(value_index):
-        return diastolic_peak
-
-    ppg_pulse_second_derivative_at_roots = ppg_pulse_second_derivative[value_index]
-    # TO DO: Consider add treatment to when value index has more than one value
-    if (ppg_pulse_second_derivative_at_roots[0]) < 0:
-        t_at_roots = t[value_index]
-        tmp_diastolic_peak = np.where(t == t_at_roots[0])
-        diastolic_peak = tmp_diastolic_peak[0][0]
-        return diastolic_peak
+    if ppg_pulse_second_derivative[first_derivative_root] < 0:
+        diastolic_peak = first_derivative_root
 
     return diastolic_peak
 
@@ -214,9 +264,9 @@ def _find_diastolic_peak(pulse_first_derivative, pulse_second_derivative, key_po
 def _find_dicrotic_notch(pulse_second_derivative, key_points):
     dicrotic_notch = 0 # always returns 0 if the key point hasn't been detected
 
-    second_derivative_maximals = pyampd.ampd.find_peaks(pulse_second_derivative[consts.PULSE_EVAL])
-    after_sys_peak = second_derivative_maximals > key_points[consts.SYS_PEAK]
-    before_dias_peak = second_derivative_maximals < key_points[consts.DIAS_PEAK]
+    second_derivative_maximals = pulse_second_derivative[consts.MAXIMA]
+    after_sys_peak = second_derivative_maximals > key_points.systolic_peak
+    before_dias_peak = second_derivative_maximals < key_points.diastolic_peak
 
     second_derivative_maximals_between_sys_and_dias_peak = second_derivative_maximals[after_sys_peak & before_dias_peak]
     if (len(second_derivative_maximals_between_sys_and_dias_peak) > 0):
@@ -231,43 +281,12 @@ def _find_dicrotic_notch(pulse_second_derivative, key_points):
 # If no such point exists, the inflection point is chosen to be the
 # midpoint between the dicrotic notch and the diastolic peak.
 def _find_inflection_point(pulse_second_derivative, key_points):
-    ts = np.round(1/(4*consts.SAMPLING_FREQ), 3)
-    t = np.linspace(0, len(pulse_second_derivative[consts.PULSE_EVAL]) * ts, num=len(pulse_second_derivative[consts.PULSE_EVAL]), endpoint=False)
-
-    inflection_point = 0 # always returns 0 if the key point hasn't been detected
-
-    inflection_point = int(np.floor((key_points[consts.DIC_NOTCH] + key_points[consts.DIAS_PEAK]) / 2))
-
-    second_derivative_roots = np.roots(pulse_second_derivative[consts.DESC_POL])
-    positive_roots = second_derivative_roots[second_derivative_roots > 0]
-
-    roots_after_dic_notch = positive_roots > t[key_points[consts.DIC_NOTCH]]
-    roots_before_dias_peak = positive_roots < t[key_points[consts.DIAS_PEAK]]
-
-    roots_in_interval = positive_roots[roots_after_dic_notch & roots_before_dias_peak]
-
-    is_complex = np.iscomplex(roots_in_interval)
-    if all(is_complex):
-        return inflection_point
-
-    is_real = np.isreal(roots_in_interval)
-    real_roots = roots_in_interval[is_real]
-    if len(real_roots == 0):
-        return inflection_point
-
-    first_real_root_in_interval = real_roots[0]
-
-    min_root = first_real_root_in_interval - ts/2
-    max_root = first_real_root_in_interval + ts/2
-
-    is_greater_than_min = t > min_root
-    is_less_than_max = t < max_root
-
-    is_in_interval = is_greater_than_min & is_less_than_max & after_dic_notch & before_dias_peak
-    if not any(is_in_interval):
-        return inflection_point
+    inflection_point = int(np.floor((key_points.dicrotic_notch + key_points.diastolic_peak) / 2))
 
-    tmp_inflection_point = np.where(t == t[is_in_interval])
-    inflection_point = tmp_inflection_point[0][0]
+    second_derivative_root = polynomial_fitting.find_zero_crossings(pulse_second_derivative[consts.PULSE_EVAL],
+                                                                    key_points.dicrotic_notch,
+                                                                    key_points.diastolic_peak)[0]
+    if second_derivative_root > 0:
+        inflection_point = second_derivative_root
 
     return inflection_point
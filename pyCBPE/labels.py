@@ -2,14 +2,15 @@
 signal label extraction. """
 
 import numpy as np
-from pyampd.ampd import find_peaks
+import pyCBPE.constants as consts
+import pyCBPE.peak_detection as peak_detection
 
-def extract(abp_segment):
+def extract(abp_segment, peak_detector=consts.LABELS_PEAK_DETECTOR):
     labels = []
 
     # calculate labels
-    systolic_blood_pressure = _get_systolic_blood_pressure(abp_segment)
-    diastolic_blood_pressure = _get_diastolic_blood_pressure(abp_segment)
+    systolic_blood_pressure = _get_systolic_blood_pressure(abp_segment, peak_detector)
+    diastolic_blood_pressure = _get_diastolic_blood_pressure(abp_segment, peak_detector)
     mean_absolute_pressure = _get_mean_absolute_pressure(abp_segment)
 
     # append labels to list
@@ -20,8 +21,102 @@ def extract(abp_segment):
     return labels
 
 
-def _get_systolic_blood_pressure(abp_segment):
-    maximals_locations = find_peaks(abp_segment)
+def extract_batch(abp_matrix, sampling_freq=consts.SAMPLING_FREQ):
+    """ Labels of every row of an (N, segment_length) matrix of abp segments.
+
+    Returns an (N, len(LABELS_COLUMNS)) int16 matrix and a mask of the same
+    shape that is False where a label could not be calculated, which holds
+    the same -1 as extract. The maxima and minima of all rows are found by
+    peak_detection.find_beats_masks and averaged with masked row sums.
+    """
+    abp_matrix = np.atleast_2d(np.asarray(abp_matrix, dtype=float))
+    is_maximum, is_minimum = peak_detection.find_beats_masks(abp_matrix, sampling_freq)
+
+    n_of_maxima = np.count_nonzero(is_maximum, axis=1)
+    n_of_minima = np.count_nonzero(is_minimum, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        systolic_blood_pressure = np.floor(np.sum(abp_matrix, axis=1, where=is_maximum) / n_of_maxima)
+        diastolic_blood_pressure = np.floor(np.sum(abp_matrix, axis=1, where=is_minimum) / n_of_minima)
+    mean_absolute_pressure = np.floor(np.mean(abp_matrix, axis=1))
+
+    labels = np.column_stack((systolic_blood_pressure, diastolic_blood_pressure, mean_absolute_pressure))
+    is_valid = np.column_stack((n_of_maxima > 0, n_of_minima > 0, np.ones(len(abp_matrix), dtype=bool)))
+    labels[~is_valid] = -1
+
+    return labels.astype(np.int16), is_valid
+
+
+def recording_beats(abp_recording, sampling_freq=consts.SAMPLING_FREQ, peak_detector=consts.RECORDING_PEAK_DETECTOR):
+    """ Onsets of the beats of a whole abp recording and their labels.
+
+    The beats start at the minima of the recording, which are detected once
+    per recording instead of once per segment. Returns the sorted onset
+    samples and the (len(onsets) - 1, len(LABELS_COLUMNS)) int16 labels of
+    the beats between consecutive onsets.
+    """
+    abp_recording = np.asarray(abp_recording, dtype=float)
+    abp_onsets = np.sort(peak_detection.find_beats(-abp_recording, sampling_freq, peak_detector))
+
+    return abp_onsets, _get_beats_labels(abp_recording, abp_onsets)
+
+
+def pulses_labels(pulse_times, beat_times, beats_labels, max_delay=consts.MAX_PULSE_ARRIVAL_DELAY):
+    """ Labels of the pulses starting at pulse_times, taken from the abp beat
+    that caused each of them, as aligned by align_beats.
+
+    beat_times are the onsets returned by recording_beats, in seconds.
+    Returns the (M, len(LABELS_COLUMNS)) int16 labels and a mask that is
+    False for the pulses without a matching beat, whose labels are -1.
+    """
+    beat_indexes = align_beats(beat_times, pulse_times, max_delay)
+    # the beat that starts at the last abp minimum does not end in the recording
+    beat_indexes[beat_indexes == len(beats_labels)] = -1
+
+    is_valid = beat_indexes >= 0
+    labels = np.full((len(beat_indexes), len(consts.LABELS_COLUMNS)), -1, dtype=np.int16)
+    labels[is_valid] = beats_labels[beat_indexes[is_valid]]
+
+    return labels, is_valid
+
+
+def align_beats(beat_times, pulse_times, max_delay=consts.MAX_PULSE_ARRIVAL_DELAY):
+    """ Index of the beat of each pulse, the last beat that starts at most
+    max_delay seconds before the pulse, or -1 if there is none.
+
+    beat_times must be sorted, so every pulse is placed by a binary search.
+    """
+    beat_times = np.asarray(beat_times, dtype=float)
+    pulse_times = np.asarray(pulse_times, dtype=float)
+    if len(beat_times) == 0:
+        return np.full(len(pulse_times), -1, dtype=int)
+
+    beat_indexes = np.searchsorted(beat_times, pulse_times, side='right') - 1
+    delays = pulse_times - beat_times[np.maximum(beat_indexes, 0)]
+
+    return np.where((beat_indexes >= 0) & (delays <= max_delay), beat_indexes, -1)
+
+
+def _get_beats_labels(abp_recording, abp_onsets):
+    # one row per beat between consecutive minima, computed with reduceat
+    # over the samples from the first to the last minimum
+    if len(abp_onsets) < 2:
+        return np.zeros((0, len(consts.LABELS_COLUMNS)), dtype=np.int16)
+
+    beats = abp_recording[abp_onsets[0]:abp_onsets[-1]]
+    beats_starts = abp_onsets[0:-1] - abp_onsets[0]
+
+    systolic_blood_pressure = np.maximum.reduceat(beats, beats_starts)
+    diastolic_blood_pressure = abp_recording[abp_onsets[0:-1]]
+    mean_absolute_pressure = np.add.reduceat(beats, beats_starts) / np.diff(abp_onsets)
+
+    beats_labels = np.column_stack((systolic_blood_pressure, diastolic_blood_pressure, mean_absolute_pressure))
+
+    return np.floor(beats_labels).astype(np.int16)
+
+
+def _get_systolic_blood_pressure(abp_segment, peak_detector=consts.LABELS_PEAK_DETECTOR):
+    maximals_locations = peak_detection.find_beats(abp_segment, consts.SAMPLING_FREQ, peak_detector)
     if len(maximals_locations) == 0:
         systolic_blood_pressure = -1
         return systolic_blood_pressure
@@ -33,8 +128,8 @@ def _get_systolic_blood_pressure(abp_segment):
     return systolic_blood_pressure
 
 
-def _get_diastolic_blood_pressure(abp_segment):
-    minimals_locations = find_peaks(-abp_segment)
+def _get_diastolic_blood_pressure(abp_segment, peak_detector=consts.LABELS_PEAK_DETECTOR):
+    minimals_locations = peak_detection.find_beats(-abp_segment, consts.SAMPLING_FREQ, peak_detector)
     if len(minimals_locations) == 0:
         diastolic_blood_presure = -1
         return diastolic_blood_presure
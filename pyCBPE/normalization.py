@@ -3,29 +3,38 @@
 
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-from pyampd.ampd import find_peaks
 import pyCBPE.constants as consts
+import pyCBPE.peak_detection as peak_detection
 
 
-def normalize(signal):
-    minimals = _detect_minimals(signal)
-    central_pulse = _get_central_pulse(signal, minimals)
+def normalize(signal, upsample_factor=consts.UPSAMPLE_FACTOR, peak_detector=consts.NORMALIZATION_PEAK_DETECTOR):
+    normalized_pulse, _ = normalize_central_pulse(signal, upsample_factor, peak_detector)
+
+    return normalized_pulse
+
+
+def normalize_central_pulse(signal, upsample_factor=consts.UPSAMPLE_FACTOR, peak_detector=consts.NORMALIZATION_PEAK_DETECTOR):
+    """ Normalized central pulse of a preprocessed segment and the sample of
+    the segment where it starts, which is -1 when the pulse is empty. """
+    sampling_freq = upsample_factor * consts.SAMPLING_FREQ
+    minimals = _detect_minimals(sampling_freq, signal, peak_detector)
+    central_pulse, central_pulse_onset = _get_central_pulse(signal, minimals)
     is_central_pulse_empty = central_pulse.size == 0
     if is_central_pulse_empty:
         normalized_pulse = np.array([])
-        return normalized_pulse
+        return normalized_pulse, -1
 
     normalized_pulse = _normalize_pulse(central_pulse)
     is_normalized_pulse_empty = normalized_pulse.size == 0
     if is_normalized_pulse_empty:
         normalized_pulse = np.array([])
-        return normalized_pulse
+        return normalized_pulse, -1
 
-    return normalized_pulse
+    return normalized_pulse, central_pulse_onset
 
 
-def _detect_minimals(signal):
-    minimals = find_peaks(-signal)
+def _detect_minimals(sampling_freq, signal, peak_detector=consts.NORMALIZATION_PEAK_DETECTOR):
+    minimals = peak_detection.find_beats(-signal, sampling_freq, peak_detector)
 
     return minimals
 
@@ -34,7 +43,7 @@ def _get_central_pulse(signal, minimals):
     n_of_minimals = len(minimals)
     if n_of_minimals < 2:
         central_pulse = np.array([])
-        return central_pulse
+        return central_pulse, -1
 
     central_minimal = int(np.floor(n_of_minimals / 2))
     if n_of_minimals == 2:
@@ -44,7 +53,7 @@ def _get_central_pulse(signal, minimals):
 
     central_pulse = signal[minimals[central_minimal] : minimals[minimal_after_central]]
 
-    return central_pulse
+    return central_pulse, int(minimals[central_minimal])
 
 
 def _normalize_pulse(pulse_signal):
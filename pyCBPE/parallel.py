@@ -0,0 +1,91 @@
+""" This is the package responsible for running the dataset generation stages
+over chunks of segments in a pool of worker processes. """
+
+import mmap
+import multiprocessing
+import numpy as np
+import pyCBPE.constants as consts
+
+# arrays opened by the initializer of each worker process
+_worker_arrays = None
+
+
+class MemmapReference:
+    """ File, dtype, shape and offset of a C contiguous np.memmap, which a
+    worker process opens again instead of receiving a pickled copy of its
+    data. """
+
+    def __init__(self, memmap_array, offset):
+        self.filename = memmap_array.filename
+        self.dtype = memmap_array.dtype
+        self.shape = memmap_array.shape
+        self.offset = offset
+
+    def open(self):
+        return np.memmap(self.filename, dtype=self.dtype, mode="r", shape=self.shape, offset=self.offset)
+
+
+def map_chunks(function, arrays, n_of_rows, chunk_size=consts.PREPROCESSING_CHUNK_SIZE, n_of_workers=1, chunks=None):
+    """ Yield function(arrays, chunk_start, chunk_stop) for each consecutive
+    chunk of chunk_size of n_of_rows rows, in the order of the chunks.
+
+    arrays is a dict of the inputs shared by every chunk and function must be
+    a module level function, so it can be sent to the workers. With more than
+    one worker the chunks run in a process pool. Memory maps and their row
+    ranges, such as segment store segments and loaded artifacts, are opened
+    again by each worker, so their rows are read from the page cache shared
+    by all the processes instead of being pickled. Any other array is pickled once per
+    worker. The results are the same as the ones of the serial path.
+
+    chunks can be a list of (chunk_start, chunk_stop) to run instead of all
+    the chunks of split_chunks, such as the ones an interrupted run missed.
+    """
+    if chunks is None:
+        chunks = split_chunks(n_of_rows, chunk_size)
+
+    if n_of_workers <= 1 or len(chunks) <= 1:
+        for chunk_start, chunk_stop in chunks:
+            yield function(arrays, chunk_start, chunk_stop)
+        return
+
+    shared_arrays = {name: _share(array) for name, array in arrays.items()}
+    tasks = [(function, chunk_start, chunk_stop) for chunk_start, chunk_stop in chunks]
+
+    with multiprocessing.Pool(min(n_of_workers, len(chunks)), _initialize_worker, (shared_arrays,)) as pool:
+        # imap returns the results in the order of the tasks
+        for result in pool.imap(_run_chunk, tasks):
+            yield result
+
+
+def split_chunks(n_of_rows, chunk_size=consts.PREPROCESSING_CHUNK_SIZE):
+    """ (chunk_start, chunk_stop) of the consecutive chunks of n_of_rows rows. """
+    return [(chunk_start, min(chunk_start + chunk_size, n_of_rows)) for chunk_start in range(0, n_of_rows, chunk_size)]
+
+
+def _share(array):
+    # a contiguous view of a memory map, such as a range of its rows, is
+    # opened again at the offset of its first byte in the file
+    if not isinstance(array, np.memmap) or array.filename is None or not array.flags.c_contiguous:
+        return array
+
+    mapped_array = array
+    while not isinstance(mapped_array.base, mmap.mmap):
+        if not isinstance(mapped_array.base, np.memmap):
+            return array
+        mapped_array = mapped_array.base
+
+    offset = mapped_array.offset + array.ctypes.data - mapped_array.ctypes.data
+
+    return MemmapReference(array, offset)
+
+
+def _initialize_worker(shared_arrays):
+    global _worker_arrays
+    _worker_arrays = {name: array.open() if isinstance(array, MemmapReference) else array
+                      for name, array in shared_arrays.items()}
+
+
+def _run_chunk(task):
+    function, chunk_start, chunk_stop = task
+
+    return function(_worker_arrays, chunk_start, chunk_stop)
@@ -0,0 +1,133 @@
+""" This is the package responsible for detecting peaks in photoplethysmogram
+and arterial blood pressure signals. """
+
+import numpy as np
+import scipy.signal
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from pyampd.ampd import find_peaks as ampd_find_peaks
+import pyCBPE.constants as consts
+
+
+def find_peaks(signal, detector=consts.AMPD_DETECTOR, min_distance=1, min_prominence=None, max_scale=None):
+    """ Find the indexes of the local maxima of signal.
+
+    AMPD_DETECTOR uses pyampd, which builds a scalogram matrix with one row
+    per scale up to half the signal length. BOUNDED_AMPD_DETECTOR runs the
+    same algorithm with the scales limited to max_scale samples and without
+    keeping the scalogram in memory. LINEAR_DETECTOR keeps the local maxima
+    that are at least min_distance samples apart and have a prominence of at
+    least min_prominence.
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    if detector == consts.AMPD_DETECTOR:
+        peaks = ampd_find_peaks(signal)
+    elif detector == consts.BOUNDED_AMPD_DETECTOR:
+        peaks = _bounded_ampd(signal, max_scale)
+    elif detector == consts.LINEAR_DETECTOR:
+        peaks = _linear_peaks(signal, min_distance, min_prominence)
+    else:
+        raise ValueError("Unknown peak detector: " + str(detector))
+
+    return peaks
+
+
+def find_beats(signal, sampling_freq, detector=consts.AMPD_DETECTOR):
+    """ Find one peak per cardiac cycle of a ppg or abp signal.
+
+    The detector parameters are derived from the physiological limits in
+    constants: peaks closer than MIN_BEAT_INTERVAL are merged and AMPD scales
+    are bounded to MAX_BEAT_INTERVAL.
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    min_distance = max(int(consts.MIN_BEAT_INTERVAL * sampling_freq), 1)
+    max_scale = max(int(consts.MAX_BEAT_INTERVAL * sampling_freq), 1)
+    min_prominence = consts.MIN_BEAT_RELATIVE_PROMINENCE * np.ptp(signal) if signal.size > 0 else None
+
+    peaks = find_peaks(signal, detector, min_distance, min_prominence, max_scale)
+
+    return peaks
+
+
+def find_beats_masks(signal_matrix, sampling_freq):
+    """ Masks of the per cycle maxima and minima of every row of a matrix of
+    ppg or abp segments.
+
+    A sample is a maximum (minimum) when no sample within MIN_BEAT_INTERVAL
+    on either side is greater (smaller), which is the condition AMPD checks
+    up to its selected scale. The whole matrix is searched with two moving
+    window filters, without a loop over the rows.
+    """
+    signal_matrix = np.atleast_2d(np.asarray(signal_matrix, dtype=float))
+    window_size = 2 * max(int(consts.MIN_BEAT_INTERVAL * sampling_freq), 1) + 1
+
+    moving_maximum = maximum_filter1d(signal_matrix, window_size, axis=-1, mode='constant', cval=-np.inf)
+    moving_minimum = minimum_filter1d(signal_matrix, window_size, axis=-1, mode='constant', cval=np.inf)
+
+    is_maximum = signal_matrix == moving_maximum
+    is_minimum = signal_matrix == moving_minimum
+
+    # a flat peak is reported at its first sample only
+    is_repeated = np.zeros(signal_matrix.shape, dtype=bool)
+    is_repeated[..., 1:] = signal_matrix[..., 1:] == signal_matrix[..., 0:-1]
+    is_maximum[..., 1:] &= ~(is_repeated[..., 1:] & is_maximum[..., 0:-1])
+    is_minimum[..., 1:] &= ~(is_repeated[..., 1:] & is_minimum[..., 0:-1])
+
+    return is_maximum, is_minimum
+
+
+def _bounded_ampd(signal, max_scale):
+    # Same steps of pyampd.ampd.find_peaks, computing each row of the local
+    # scalogram matrix on demand instead of storing all of them.
+    signal_length = len(signal)
+    if signal_length < 3:
+        return np.array([], dtype=int)
+
+    detrended_signal = scipy.signal.detrend(signal)
+
+    n_of_scales = signal_length // 2
+    if max_scale:
+        n_of_scales = min(max_scale, n_of_scales)
+
+    # number of local maxima at each scale, normalized by the valid region
+    scale_weights = np.arange(signal_length // 2, signal_length // 2 - n_of_scales, -1)
+    n_of_maxima = np.zeros(n_of_scales)
+    for scale in range(1, n_of_scales + 1):
+        n_of_maxima[scale - 1] = np.count_nonzero(_local_maxima_at_scale(detrended_signal, scale))
+
+    best_scale = int(np.argmax(n_of_maxima * scale_weights))
+    if best_scale == 0:
+        return np.array([], dtype=int)
+
+    # keep the maxima that persist on every scale up to the best one
+    is_peak = np.ones(signal_length, dtype=bool)
+    for scale in range(1, best_scale + 1):
+        is_peak &= _local_maxima_at_scale(detrended_signal, scale)
+
+    peaks = np.flatnonzero(is_peak)
+
+    return peaks
+
+
+def _local_maxima_at_scale(signal, scale):
+    signal_length = len(signal)
+    is_maximum = np.ones(signal_length, dtype=bool)
+
+    is_maximum[0:signal_length - scale] &= signal[0:signal_length - scale] > signal[scale:signal_length]
+    is_maximum[scale:signal_length] &= signal[scale:signal_length] > signal[0:signal_length - scale]
+
+    return is_maximum
+
+
+def _linear_peaks(signal, min_distance, min_prominence):
+    # bounding the prominence search window keeps the cost linear in the
+    # signal length
+    prominence_window = None
+    if min_prominence is not None:
+        prominence_window = 2 * max(min_distance, 1) + 1
+
+    peaks, _ = scipy.signal.find_peaks(signal, distance=max(min_distance, 1), prominence=min_prominence,
+                                       wlen=prominence_window)
+
+    return peaks
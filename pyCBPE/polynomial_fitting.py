@@ -0,0 +1,148 @@
+""" This is the package responsible for fitting polynomials to sections of
+photoplethysmogram pulses and evaluating their derivatives. """
+
+from functools import lru_cache
+import numpy as np
+import pyCBPE.constants as consts
+
+
+def fit_sections(sections, degree, sampling_freq):
+    """ Fit a polynomial to every row of a (n_sections, section_length) matrix.
+
+    Time starts at 0 on the first sample of each section. The least squares
+    solution and the derivative evaluation matrices only depend on the
+    section length, so they are cached and the whole batch is fitted with a
+    single matrix product.
+
+    Returns the coefficients, highest power first as in np.polyfit, and the
+    evaluation of the polynomial and of its first and second derivatives on
+    the section samples, one row per section.
+    """
+    sections = np.atleast_2d(np.asarray(sections, dtype=float))
+    section_length = sections.shape[1]
+
+    pseudo_inverse, evaluation_matrices = _fitting_matrices(section_length, degree, sampling_freq)
+
+    coefficients = sections @ pseudo_inverse.T
+    section_eval = coefficients @ evaluation_matrices[0].T
+    first_derivative_eval = coefficients @ evaluation_matrices[1].T
+    second_derivative_eval = coefficients @ evaluation_matrices[2].T
+
+    return coefficients, section_eval, first_derivative_eval, second_derivative_eval
+
+
+def fit_ragged_sections(sections, degree, sampling_freq):
+    """ Fit a polynomial to each section of a list of sections of any length.
+
+    Sections with the same length are fitted together by fit_sections. The
+    results are returned as lists in the order of the input sections.
+    """
+    indexes_by_length = {}
+    for section_index, section in enumerate(sections):
+        indexes_by_length.setdefault(len(section), []).append(section_index)
+
+    n_of_sections = len(sections)
+    coefficients = [None] * n_of_sections
+    section_eval = [None] * n_of_sections
+    first_derivative_eval = [None] * n_of_sections
+    second_derivative_eval = [None] * n_of_sections
+
+    for section_indexes in indexes_by_length.values():
+        same_length_sections = np.vstack([sections[section_index] for section_index in section_indexes])
+        fitted = fit_sections(same_length_sections, degree, sampling_freq)
+
+        for row, section_index in enumerate(section_indexes):
+            coefficients[section_index] = fitted[0][row]
+            section_eval[section_index] = fitted[1][row]
+            first_derivative_eval[section_index] = fitted[2][row]
+            second_derivative_eval[section_index] = fitted[3][row]
+
+    return coefficients, section_eval, first_derivative_eval, second_derivative_eval
+
+
+def derivative_coefficients(coefficients):
+    """ Coefficients of the derivative of each row of coefficients, as np.polyder. """
+    coefficients = np.asarray(coefficients)
+    degree = coefficients.shape[-1] - 1
+    powers = np.arange(degree, 0, -1)
+
+    return coefficients[..., 0:-1] * powers
+
+
+@lru_cache(maxsize=consts.POLYNOMIAL_FIT_CACHE_SIZE)
+def _fitting_matrices(section_length, degree, sampling_freq):
+    section_time = np.arange(section_length) / sampling_freq
+
+    vandermonde = np.vander(section_time, degree + 1)
+    pseudo_inverse = np.linalg.pinv(vandermonde)
+
+    # column j multiplies the coefficient of t ** (degree - j)
+    powers = np.arange(degree, -1, -1)
+    first_derivative_vandermonde = np.zeros((section_length, degree + 1))
+    first_derivative_vandermonde[:, 0:-1] = vandermonde[:, 1:] * powers[0:-1]
+    second_derivative_vandermonde = np.zeros((section_length, degree + 1))
+    second_derivative_vandermonde[:, 0:-2] = vandermonde[:, 2:] * powers[0:-2] * (powers[0:-2] - 1)
+
+    evaluation_matrices = (vandermonde, first_derivative_vandermonde, second_derivative_vandermonde)
+
+    return pseudo_inverse, evaluation_matrices
+
+
+def find_zero_crossings(curves, start_indexes, stop_indexes, direction=consts.ANY_CROSSING):
+    """ Sample index of the first zero crossing of every row of curves.
+
+    Only crossings between samples start and stop of each row are searched,
+    and the index of the sample closest to the linearly interpolated root is
+    returned, or -1 if the row has no crossing in that interval. The rows of
+    a batch of pulses of different lengths can be padded with NaN.
+    """
+    curves = np.atleast_2d(np.asarray(curves, dtype=float))
+    n_of_curves, curve_length = curves.shape
+
+    start_indexes = np.broadcast_to(start_indexes, n_of_curves)
+    stop_indexes = np.broadcast_to(stop_indexes, n_of_curves)
+
+    current_samples = curves[:, 0:-1]
+    next_samples = curves[:, 1:]
+    if direction == consts.RISING_CROSSING:
+        is_crossing = (current_samples < 0) & (next_samples >= 0)
+    elif direction == consts.FALLING_CROSSING:
+        is_crossing = (current_samples > 0) & (next_samples <= 0)
+    elif direction == consts.ANY_CROSSING:
+        is_crossing = ((current_samples < 0) & (next_samples >= 0)) | ((current_samples > 0) & (next_samples <= 0))
+    else:
+        raise ValueError("Unknown zero crossing direction: " + str(direction))
+
+    sample_indexes = np.arange(curve_length - 1)
+    is_crossing &= sample_indexes >= start_indexes[:, np.newaxis]
+    is_crossing &= sample_indexes < stop_indexes[:, np.newaxis]
+
+    has_crossing = np.any(is_crossing, axis=1)
+    first_crossing = np.argmax(is_crossing, axis=1)
+
+    rows = np.arange(n_of_curves)
+    is_next_sample_closer = np.abs(next_samples[rows, first_crossing]) < np.abs(current_samples[rows, first_crossing])
+    crossing_indexes = first_crossing + is_next_sample_closer
+
+    return np.where(has_crossing, crossing_indexes, -1)
+
+
+def find_local_extrema(curves):
+    """ Masks of the local maxima and minima of every row of curves.
+
+    Both masks come from a single pass over the sign of the differences
+    between consecutive samples. The first and last samples of a row are
+    never extrema and NaN padding is ignored.
+    """
+    curves = np.atleast_2d(np.asarray(curves, dtype=float))
+
+    slope_signs = np.sign(np.diff(curves, axis=1))
+    rising_before = slope_signs[:, 0:-1]
+    rising_after = slope_signs[:, 1:]
+
+    is_maximum = np.zeros(curves.shape, dtype=bool)
+    is_minimum = np.zeros(curves.shape, dtype=bool)
+    is_maximum[:, 1:-1] = (rising_before > 0) & (rising_after <= 0)
+    is_minimum[:, 1:-1] = (rising_before < 0) & (rising_after >= 0)
+
+    return is_maximum, is_minimum
@@ -3,53 +3,208 @@ photoplethysmogram signals. """
 
 import numpy as np
 from scipy import signal
+from scipy.ndimage import uniform_filter1d
 import pyCBPE.constants as consts
+import pyCBPE.filter_bank as filter_bank
+from pyCBPE.running_median import running_median
+from pyCBPE.running_median import RunningMedian
 
 
-def preprocess(signal):
+def preprocess(signal, baseline_method=consts.BASELINE_WANDER_METHOD,
+               upsample_factor=consts.UPSAMPLE_FACTOR, resampler=consts.RESAMPLER):
     preprocessed_signal = _remove_high_frequency_components(signal)
-    preprocessed_signal = _remove_baseline_wander(preprocessed_signal)
-    preprocessed_signal = _upsample(preprocessed_signal)
+    preprocessed_signal = _remove_baseline_wander(preprocessed_signal, baseline_method)
+    preprocessed_signal = _upsample(preprocessed_signal, upsample_factor, resampler)
 
     return preprocessed_signal
 
 
-def _remove_high_frequency_components(ppg_signal):
-    filter_order = 5
-    max_ripple = 0.5
-    cut_off_freq_hz = 10
-    cut_off_freq_rad_smp = (2 * cut_off_freq_hz) / consts.SAMPLING_FREQ
-    low_pass_filtered_signal = np.zeros(len(ppg_signal))
+def preprocess_batch(signal_matrix, chunk_size=consts.PREPROCESSING_CHUNK_SIZE,
+                     baseline_method=consts.BASELINE_WANDER_METHOD,
+                     upsample_factor=consts.UPSAMPLE_FACTOR, resampler=consts.RESAMPLER):
+    """ Preprocess a (n_segments, n_samples) matrix of segments along axis 1.
+
+    Segments are processed in blocks of chunk_size rows, so the temporary
+    arrays created by the filters never exceed a single block. Each row of
+    the output is equal to calling preprocess on the corresponding row.
+    """
+    n_of_segments, n_of_samples = np.shape(signal_matrix)
+    upsampled_n_of_samples = get_upsampled_length(n_of_samples, upsample_factor)
+
+    preprocessed_matrix = np.zeros((n_of_segments, upsampled_n_of_samples))
+
+    for chunk_start in range(0, n_of_segments, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, n_of_segments)
+        signal_chunk = np.asarray(signal_matrix[chunk_start:chunk_stop], dtype=float)
+        preprocessed_matrix[chunk_start:chunk_stop] = preprocess(signal_chunk, baseline_method, upsample_factor, resampler)
 
-    cheby_num, cheby_den = signal.cheby1(filter_order, max_ripple, cut_off_freq_rad_smp, btype='lowpass')
-    low_pass_filtered_signal = signal.filtfilt(cheby_num, cheby_den, ppg_signal)
+    return preprocessed_matrix
+
+
+# All the steps below operate along the last axis, so they accept both a
+# single segment and a matrix with one segment per row.
+def _remove_high_frequency_components(ppg_signal):
+    cheby_sos = _get_low_pass_sos(consts.SAMPLING_FREQ)
+    low_pass_filtered_signal = signal.sosfiltfilt(cheby_sos, ppg_signal, axis=-1)
 
     return low_pass_filtered_signal
 
 
-def _remove_baseline_wander(ppg_signal):
-    signal_length = len(ppg_signal)
+def _get_low_pass_sos(sampling_freq):
+    # shared by the batch and streaming paths, so both use the same design
+    return filter_bank.chebyshev_type_1(consts.LOW_PASS_FILTER_ORDER, consts.LOW_PASS_MAX_RIPPLE,
+                                        consts.LOW_PASS_CUT_OFF_FREQ, sampling_freq, 'lowpass')
+
+
+def _get_baseline_window_sizes(signal_length):
     first_window_size = int(np.floor(0.7 * signal_length))
     second_window_size = int(np.floor(0.3 * signal_length))
 
-    mov_median_output = np.zeros(signal_length)
-    detrended_signal = np.zeros(signal_length)
+    return first_window_size, second_window_size
+
 
-    # todo: make sure that window sizes are odd
-    mov_median_output = signal.medfilt(ppg_signal, first_window_size)
-    mov_median_output = signal.medfilt(mov_median_output, second_window_size)
+def _remove_baseline_wander(ppg_signal, baseline_method=consts.BASELINE_WANDER_METHOD):
+    signal_length = np.shape(ppg_signal)[-1]
+    first_window_size, second_window_size = _get_baseline_window_sizes(signal_length)
 
-    detrended_signal = np.subtract(ppg_signal, mov_median_output)
+    if baseline_method == consts.MOVING_MEDIAN_BASELINE:
+        # todo: make sure that window sizes are odd
+        baseline = running_median(ppg_signal, first_window_size)
+        baseline = running_median(baseline, second_window_size)
+    elif baseline_method == consts.MOVING_MEAN_BASELINE:
+        baseline = uniform_filter1d(ppg_signal, first_window_size, axis=-1, mode='constant')
+        baseline = uniform_filter1d(baseline, second_window_size, axis=-1, mode='constant')
+    else:
+        raise ValueError("Unknown baseline wander removal method: " + str(baseline_method))
+
+    detrended_signal = np.subtract(ppg_signal, baseline)
 
     return detrended_signal
 
 
-def _upsample(ppg_signal):
-    signal_length = len(ppg_signal)
-    desired_sampling_freq = 4 * consts.SAMPLING_FREQ
+def _upsample(ppg_signal, upsample_factor=consts.UPSAMPLE_FACTOR, resampler=consts.RESAMPLER):
+    if upsample_factor == 1:
+        return np.array(ppg_signal, dtype=float)
+
+    if resampler not in _RESAMPLERS:
+        raise ValueError("Unknown resampler: " + str(resampler))
 
-    desired_n_of_samples = int((desired_sampling_freq * signal_length) / (consts.SAMPLING_FREQ))
-    upsampled_signal = np.zeros(desired_n_of_samples)
-    upsampled_signal = signal.resample(ppg_signal, desired_n_of_samples)
+    upsampled_signal = _RESAMPLERS[resampler](ppg_signal, upsample_factor)
 
     return upsampled_signal
+
+
+def _fft_upsample(ppg_signal, upsample_factor):
+    signal_length = np.shape(ppg_signal)[-1]
+    desired_n_of_samples = get_upsampled_length(signal_length, upsample_factor)
+
+    upsampled_signal = signal.resample(ppg_signal, desired_n_of_samples, axis=-1)
+
+    return upsampled_signal
+
+
+def _polyphase_upsample(ppg_signal, upsample_factor):
+    upsampled_signal = signal.resample_poly(ppg_signal, upsample_factor, 1, axis=-1)
+
+    return upsampled_signal
+
+
+def get_upsampled_length(signal_length, upsample_factor=consts.UPSAMPLE_FACTOR):
+    desired_n_of_samples = int(upsample_factor * signal_length)
+
+    return desired_n_of_samples
+
+
+# resampling methods available to _upsample, keyed by the names in constants
+_RESAMPLERS = {
+    consts.FFT_RESAMPLER: _fft_upsample,
+    consts.POLYPHASE_RESAMPLER: _polyphase_upsample
+}
+
+
+class StreamingPreprocessor:
+    """ Preprocess a continuous photoplethysmogram stream chunk by chunk.
+
+    Chunks may have any size. The low-pass filter state, the moving median
+    windows and the interpolation filter state are kept between calls, so
+    feeding a recording in pieces gives the same output as feeding it at
+    once. The stream is filtered causally, so the output is not equal to
+    preprocess on a segment: the low-pass is not zero-phase and the baseline
+    is estimated from past samples only.
+
+    The baseline at a sample is only known once half of each moving median
+    window has been received after it, so every call to process returns the
+    upsampled, detrended samples that became ready during that call.
+    """
+
+    def __init__(self, sampling_freq=consts.SAMPLING_FREQ, segment_time=consts.SEGMENT_TIME,
+                 upsample_factor=consts.UPSAMPLE_FACTOR):
+        self._upsample_factor = upsample_factor
+
+        self._low_pass_sos = _get_low_pass_sos(sampling_freq)
+        self._low_pass_state = None
+
+        # same windows used by _remove_baseline_wander on a segment
+        first_window_size, second_window_size = _get_baseline_window_sizes(segment_time * sampling_freq)
+        self._first_median = RunningMedian(first_window_size)
+        self._second_median = RunningMedian(second_window_size)
+        self._baseline_delay = first_window_size // 2 + second_window_size // 2
+
+        self._n_of_samples = 0
+        self._pending_samples = np.zeros(0)
+
+        self._interpolation_fir = filter_bank.interpolation_fir(upsample_factor)
+        self._interpolation_state = np.zeros(len(self._interpolation_fir) - 1)
+
+    def process(self, ppg_chunk):
+        ppg_chunk = np.asarray(ppg_chunk, dtype=float)
+        if ppg_chunk.size == 0:
+            return np.zeros(0)
+
+        low_pass_filtered_chunk = self._remove_high_frequency_components(ppg_chunk)
+        detrended_chunk = self._remove_baseline_wander(low_pass_filtered_chunk)
+        upsampled_chunk = self._upsample(detrended_chunk)
+
+        return upsampled_chunk
+
+    def _remove_high_frequency_components(self, ppg_chunk):
+        if self._low_pass_state is None:
+            # start from the steady state of the first sample to avoid a step
+            self._low_pass_state = signal.sosfilt_zi(self._low_pass_sos) * ppg_chunk[0]
+
+        low_pass_filtered_chunk, self._low_pass_state = signal.sosfilt(self._low_pass_sos, ppg_chunk,
+                                                                       zi=self._low_pass_state)
+
+        return low_pass_filtered_chunk
+
+    def _remove_baseline_wander(self, ppg_chunk):
+        baseline = self._first_median.update(ppg_chunk)
+        baseline = self._second_median.update(baseline)
+
+        # baseline[k] is centered on the sample received _baseline_delay
+        # samples before the k-th sample of this chunk
+        first_sample_index = self._n_of_samples
+        self._n_of_samples += len(ppg_chunk)
+        first_ready_index = max(first_sample_index, self._baseline_delay)
+        n_of_ready_samples = max(self._n_of_samples - first_ready_index, 0)
+
+        buffered_samples = np.concatenate((self._pending_samples, ppg_chunk))
+        ready_samples = buffered_samples[0:n_of_ready_samples]
+        ready_baseline = baseline[len(baseline) - n_of_ready_samples:]
+        self._pending_samples = buffered_samples[n_of_ready_samples:]
+
+        detrended_chunk = np.subtract(ready_samples, ready_baseline)
+
+        return detrended_chunk
+
+    def _upsample(self, ppg_chunk):
+        if self._upsample_factor == 1 or ppg_chunk.size == 0:
+            return ppg_chunk
+
+        zero_stuffed_chunk = np.zeros(len(ppg_chunk) * self._upsample_factor)
+        zero_stuffed_chunk[::self._upsample_factor] = ppg_chunk
+
+        upsampled_chunk, self._interpolation_state = signal.lfilter(self._interpolation_fir, 1, zero_stuffed_chunk,
+                                                                    zi=self._interpolation_state)
+
+        return upsampled_chunk
@@ -0,0 +1,67 @@
+""" This is the package responsible for writing the tables produced by the
+dataset scripts, one block of rows at a time. """
+
+import numpy as np
+import pandas as pd
+import pyCBPE.constants as consts
+
+
+class ResultWriter:
+    """ Rows of a table written to a csv file through a preallocated buffer.
+
+    Rows are copied into a (block_size, len(columns)) numpy buffer and the
+    buffer is appended to the file whenever it is full, so building a table
+    of n rows takes O(n) time and at most one block of memory, instead of
+    the O(n ** 2) copies of growing a DataFrame row by row. The file starts
+    with the header and is written with DataFrame.to_csv, so its format is
+    the same as writing the whole table at once.
+    """
+
+    def __init__(self, path, columns, block_size=consts.RESULT_WRITER_BLOCK_SIZE, dtype=np.float64):
+        self.path = path
+        self.columns = list(columns)
+        self.n_of_rows = 0
+
+        self._buffer = np.empty((block_size, len(self.columns)), dtype=dtype)
+        self._n_of_buffered_rows = 0
+
+        # the header is written even if no row is ever added
+        pd.DataFrame(columns=self.columns).to_csv(self.path, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_row(self, row):
+        self.write_rows(np.asarray(row)[np.newaxis, :])
+
+    def write_rows(self, rows):
+        rows = np.asarray(rows)
+        if rows.ndim != 2 or rows.shape[1] != len(self.columns):
+            raise ValueError("Expected rows with " + str(len(self.columns)) + " columns, got shape " + str(rows.shape))
+
+        block_size = len(self._buffer)
+        next_row = 0
+        while next_row < len(rows):
+            n_of_copied_rows = min(block_size - self._n_of_buffered_rows, len(rows) - next_row)
+            self._buffer[self._n_of_buffered_rows:self._n_of_buffered_rows + n_of_copied_rows] = rows[next_row:next_row + n_of_copied_rows]
+            self._n_of_buffered_rows += n_of_copied_rows
+            next_row += n_of_copied_rows
+
+            if self._n_of_buffered_rows == block_size:
+                self.flush()
+
+    def flush(self):
+        if self._n_of_buffered_rows == 0:
+            return
+
+        block = pd.DataFrame(self._buffer[0:self._n_of_buffered_rows], columns=self.columns)
+        block.to_csv(self.path, mode="a", header=False, index=False)
+
+        self.n_of_rows += self._n_of_buffered_rows
+        self._n_of_buffered_rows = 0
+
+    def close(self):
+        self.flush()
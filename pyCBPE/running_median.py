@@ -0,0 +1,82 @@
+""" This is the package responsible for computing moving medians of
+photoplethysmogram signals. """
+
+import bisect
+from collections import deque
+import numpy as np
+
+
+def running_median(signal, window_size):
+    """ Moving median along the last axis of signal.
+
+    The output is equal to scipy.signal.medfilt with the same odd window
+    size, including the zero padding at the edges, but the window is kept
+    sorted and updated incrementally as it slides, instead of being
+    selected again for every sample. A matrix is filtered row by row.
+    """
+    if window_size % 2 == 0:
+        raise ValueError("window_size must be odd.")
+
+    signal = np.asarray(signal, dtype=float)
+    if signal.ndim == 1:
+        return _running_median_1d(signal, window_size)
+
+    signal_rows = signal.reshape(-1, signal.shape[-1])
+    median_rows = np.zeros(signal_rows.shape)
+    for row_index in range(len(signal_rows)):
+        median_rows[row_index] = _running_median_1d(signal_rows[row_index], window_size)
+
+    return median_rows.reshape(signal.shape)
+
+
+def _running_median_1d(signal, window_size):
+    signal_length = len(signal)
+    half_window = window_size // 2
+
+    padding = np.zeros(half_window)
+    padded_signal = np.concatenate((padding, signal, padding)).tolist()
+
+    sorted_window = sorted(padded_signal[0:window_size])
+    median = [0.0] * signal_length
+    median[0] = sorted_window[half_window]
+
+    for sample_index in range(1, signal_length):
+        leaving_sample = padded_signal[sample_index - 1]
+        entering_sample = padded_signal[sample_index + window_size - 1]
+
+        del sorted_window[bisect.bisect_left(sorted_window, leaving_sample)]
+        bisect.insort(sorted_window, entering_sample)
+
+        median[sample_index] = sorted_window[half_window]
+
+    return np.array(median)
+
+
+class RunningMedian:
+    """ Causal moving median of a stream delivered in chunks.
+
+    Each output sample is the median of the last window_size input samples,
+    or of all the samples received so far while the window is filling up.
+    The window is kept between calls to update.
+    """
+
+    def __init__(self, window_size):
+        self._window_size = window_size
+        self._window = deque()
+        self._sorted_window = []
+
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=float)
+        median = [0.0] * len(samples)
+
+        for sample_index, entering_sample in enumerate(samples.tolist()):
+            if len(self._window) == self._window_size:
+                leaving_sample = self._window.popleft()
+                del self._sorted_window[bisect.bisect_left(self._sorted_window, leaving_sample)]
+
+            self._window.append(entering_sample)
+            bisect.insort(self._sorted_window, entering_sample)
+
+            median[sample_index] = self._sorted_window[len(self._sorted_window) // 2]
+
+        return np.array(median)
@@ -0,0 +1,138 @@
+""" This is the package responsible for storing the ppg and abp segments of
+the dataset splits in a binary format that is read through memory maps. """
+
+import json
+import os
+import shutil
+import numpy as np
+import pyCBPE.constants as consts
+
+_SEGMENT_DTYPE = np.float32
+
+
+class SegmentStoreWriter:
+    """ Writes the segments of consecutive records to a segment store.
+
+    A store is a directory with one contiguous float32 file per signal, of
+    n_of_segments rows of segment_length samples, and a small json header
+    with the sampling frequency, the segment length, the signals, the record
+    ids and the offset of the first segment of each record, plus the range
+    of records of the shard that wrote it, if any. The files are
+    written in a temporary directory that replaces the store on close, so a
+    store is either complete or missing.
+    """
+
+    def __init__(self, path, sampling_freq=consts.SAMPLING_FREQ, segment_length=consts.SEGMENT_TIME * consts.SAMPLING_FREQ,
+                 signals=consts.SEGMENT_STORE_SIGNALS, shard=None):
+        self.path = path
+        self.sampling_freq = sampling_freq
+        self.segment_length = segment_length
+        self.signals = list(signals)
+        self.shard = shard
+
+        self._record_ids = []
+        self._record_offsets = [0]
+
+        self._temporary_path = path + ".tmp"
+        shutil.rmtree(self._temporary_path, ignore_errors=True)
+        os.makedirs(self._temporary_path)
+        self._signal_files = {signal: open(os.path.join(self._temporary_path, signal + consts.SEGMENT_STORE_SUFIX), "wb")
+                              for signal in self.signals}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
+
+    @property
+    def n_of_segments(self):
+        return self._record_offsets[-1]
+
+    def write_segments(self, record_id, segments):
+        """ Write the segments of a record, a dict of one (n_of_segments,
+        segment_length) matrix per signal, such as the views returned by
+        ingestion.segment_recording. """
+        n_of_segments = len(segments[self.signals[0]])
+
+        for signal in self.signals:
+            signal_segments = np.asarray(segments[signal], dtype=_SEGMENT_DTYPE)
+            if signal_segments.shape != (n_of_segments, self.segment_length):
+                raise ValueError("Expected " + str(n_of_segments) + " segments of " + str(self.segment_length) +
+                                 " samples for signal " + signal + ", got shape " + str(signal_segments.shape))
+
+            signal_segments.tofile(self._signal_files[signal])
+
+        self._record_ids.append(record_id)
+        self._record_offsets.append(self._record_offsets[-1] + n_of_segments)
+
+    def close(self):
+        for signal_file in self._signal_files.values():
+            signal_file.close()
+
+        header = {
+            "sampling_freq": self.sampling_freq,
+            "segment_length": self.segment_length,
+            "signals": self.signals,
+            "n_of_segments": self.n_of_segments,
+            "record_ids": self._record_ids,
+            "record_offsets": self._record_offsets,
+            "shard": self.shard
+        }
+        with open(os.path.join(self._temporary_path, consts.SEGMENT_STORE_HEADER), "w") as header_file:
+            json.dump(header, header_file)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.rename(self._temporary_path, self.path)
+
+    def _discard(self):
+        for signal_file in self._signal_files.values():
+            signal_file.close()
+        shutil.rmtree(self._temporary_path, ignore_errors=True)
+
+
+class SegmentStore:
+    """ Read only view of a segment store written by SegmentStoreWriter.
+
+    Opening a store only reads its header. The segments of each signal are
+    an (n_of_segments, segment_length) np.memmap, so rows are read from the
+    page cache when they are used and are shared by every process that
+    opens the same store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, consts.SEGMENT_STORE_HEADER)) as header_file:
+            header = json.load(header_file)
+
+        self.sampling_freq = header["sampling_freq"]
+        self.segment_length = header["segment_length"]
+        self.signals = header["signals"]
+        self.n_of_segments = header["n_of_segments"]
+        self.record_ids = header["record_ids"]
+        self.record_offsets = np.asarray(header["record_offsets"], dtype=np.int64)
+        self.shard = header.get("shard")
+
+    def __len__(self):
+        return self.n_of_segments
+
+    def segments(self, signal):
+        if signal not in self.signals:
+            raise ValueError("Unknown segment store signal: " + str(signal))
+
+        # an empty file cannot be memory mapped
+        if self.n_of_segments == 0:
+            return np.zeros((0, self.segment_length), dtype=_SEGMENT_DTYPE)
+
+        return np.memmap(self.signal_path(signal), dtype=_SEGMENT_DTYPE, mode="r", shape=(self.n_of_segments, self.segment_length))
+
+    def record_segments(self, record_index):
+        """ Slice of the rows of the segments of a record. """
+        return slice(int(self.record_offsets[record_index]), int(self.record_offsets[record_index + 1]))
+
+    def signal_path(self, signal):
+        return os.path.join(self.path, signal + consts.SEGMENT_STORE_SUFIX)
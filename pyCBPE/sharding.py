@@ -0,0 +1,131 @@
+""" This is the package responsible for splitting the dataset preparation and
+generation into independent shards and merging their outputs. """
+
+import os
+import pyCBPE.segment_store as segment_store
+
+
+def parse_shard(shard):
+    """ (shard_index, n_of_shards) of a "i/N" shard, with 0 <= i < N. """
+    try:
+        shard_index, n_of_shards = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError("Expected a shard as i/N, got " + str(shard))
+
+    if n_of_shards < 1 or not 0 <= shard_index < n_of_shards:
+        raise ValueError("Expected a shard index from 0 to " + str(n_of_shards - 1) + ", got " + str(shard))
+
+    return shard_index, n_of_shards
+
+
+def shard_range(n_of_items, shard_index, n_of_shards):
+    """ [start, stop) of the consecutive items of a shard. The shards of the
+    same items have sizes that differ by at most one and, in shard order,
+    cover the items in their original order. """
+    start = n_of_items * shard_index // n_of_shards
+    stop = n_of_items * (shard_index + 1) // n_of_shards
+
+    return start, stop
+
+
+def shard_sizes(n_of_items, n_of_shards):
+    """ Number of items of each shard of n_of_items items. """
+    shard_sizes = []
+    for shard_index in range(n_of_shards):
+        start, stop = shard_range(n_of_items, shard_index, n_of_shards)
+        shard_sizes.append(stop - start)
+
+    return shard_sizes
+
+
+def shard_suffix(shard):
+    """ Suffix of the outputs of a shard, empty for an unsharded run. """
+    if shard is None:
+        return ""
+
+    shard_index, n_of_shards = shard
+    return "_shard_" + str(shard_index) + "_of_" + str(n_of_shards)
+
+
+def merge_segment_stores(shard_store_paths, merged_store_path):
+    """ Concatenate the segment stores of the shards of a part, in shard
+    order, into a single segment store and return its number of segments.
+
+    The stores must come from the same ingestion, with shard headers whose
+    record ranges follow each other and cover every record, and must have
+    as many records as their range.
+    """
+    if len(shard_store_paths) == 0:
+        raise ValueError("Expected at least one segment store to merge")
+    shard_stores = [segment_store.SegmentStore(shard_store_path) for shard_store_path in shard_store_paths]
+
+    next_record = 0
+    for shard_index, shard_store in enumerate(shard_stores):
+        shard = shard_store.shard
+        if shard is None or shard["index"] != shard_index or shard["n_of_shards"] != len(shard_stores):
+            raise ValueError("Segment store " + shard_store.path + " is not shard " + str(shard_index) + " of " + str(len(shard_stores)))
+        if shard["record_start"] != next_record or len(shard_store.record_ids) != shard["record_stop"] - shard["record_start"]:
+            raise ValueError("Segment store " + shard_store.path + " does not hold records " + str(next_record) +
+                             " to " + str(shard["record_stop"] - 1))
+        if (shard_store.sampling_freq, shard_store.segment_length, shard_store.signals) != \
+                (shard_stores[0].sampling_freq, shard_stores[0].segment_length, shard_stores[0].signals):
+            raise ValueError("Segment store " + shard_store.path + " has another format than " + shard_stores[0].path)
+        next_record = shard["record_stop"]
+
+    if next_record != shard_stores[-1].shard["n_of_records"]:
+        raise ValueError("The shards hold " + str(next_record) + " of " + str(shard_stores[-1].shard["n_of_records"]) + " records")
+
+    first_store = shard_stores[0]
+    with segment_store.SegmentStoreWriter(merged_store_path, first_store.sampling_freq, first_store.segment_length,
+                                          first_store.signals) as merged_store_writer:
+        for shard_store in shard_stores:
+            shard_segments = {signal: shard_store.segments(signal) for signal in shard_store.signals}
+            for record_index, record_id in enumerate(shard_store.record_ids):
+                record_segments = shard_store.record_segments(record_index)
+                merged_store_writer.write_segments(record_id, {signal: segments[record_segments]
+                                                               for signal, segments in shard_segments.items()})
+
+        n_of_segments = merged_store_writer.n_of_segments
+
+    return n_of_segments
+
+
+def merge_csv_files(shard_csv_paths, shard_n_of_rows, merged_csv_path):
+    """ Concatenate the csv files of the shards, in shard order, into a
+    single csv file with one header and return its number of rows.
+
+    Every file must have the same header and its expected number of rows.
+    The rows are copied line by line to a temporary file that only replaces
+    the merged file when every shard is valid.
+    """
+    temporary_path = merged_csv_path + ".tmp"
+    header = None
+    n_of_rows = 0
+
+    try:
+        with open(temporary_path, "w") as merged_csv_file:
+            for shard_csv_path, expected_n_of_rows in zip(shard_csv_paths, shard_n_of_rows):
+                with open(shard_csv_path) as shard_csv_file:
+                    shard_header = shard_csv_file.readline()
+                    if header is None:
+                        header = shard_header
+                        merged_csv_file.write(header)
+                    elif shard_header != header:
+                        raise ValueError("Csv file " + shard_csv_path + " has another header than " + shard_csv_paths[0])
+
+                    shard_rows = 0
+                    for line in shard_csv_file:
+                        merged_csv_file.write(line)
+                        shard_rows += 1
+
+                if shard_rows != expected_n_of_rows:
+                    raise ValueError("Csv file " + shard_csv_path + " has " + str(shard_rows) + " rows, expected " +
+                                     str(expected_n_of_rows))
+                n_of_rows += shard_rows
+    except Exception:
+        os.remove(temporary_path)
+        raise
+
+    os.replace(temporary_path, merged_csv_path)
+
+    return n_of_rows
@@ -0,0 +1,69 @@
+""" This script is responsible for measuring the time taken by the baseline
+wander removal methods on realistic segment lengths. """
+
+# Libraries
+import numpy as np
+import timeit
+from scipy import signal
+
+# Package modules
+import pyCBPE.preprocessing
+import pyCBPE.constants as consts
+
+SEGMENT_TIMES = [5, 10, 30] # in seconds
+BATCH_SIZE = 16
+N_OF_REPETITIONS = 3
+
+
+def main():
+    print("##### pyCBPE Framework #####")
+    print("### Baseline wander removal benchmark script ###")
+
+    ppg_seg = np.genfromtxt(consts.ROOT_PATH + consts.PPG_SEG_PATH, delimiter=',')
+
+    for segment_time in SEGMENT_TIMES:
+        segment_samples = segment_time * consts.SAMPLING_FREQ
+        # repeat the sample segment to build a batch with the desired length
+        n_of_repeats = int(np.ceil(segment_samples / len(ppg_seg)))
+        segment = np.tile(ppg_seg, n_of_repeats)[0:segment_samples]
+        segment_matrix = np.tile(segment, (BATCH_SIZE, 1))
+
+        print("Segment length: " + str(segment_samples) + " samples")
+
+        medfilt_time = _time_per_segment(lambda: _remove_baseline_wander_with_medfilt(segment_matrix))
+        median_time = _time_per_segment(lambda: pyCBPE.preprocessing._remove_baseline_wander(segment_matrix, consts.MOVING_MEDIAN_BASELINE))
+        mean_time = _time_per_segment(lambda: pyCBPE.preprocessing._remove_baseline_wander(segment_matrix, consts.MOVING_MEAN_BASELINE))
+
+        medfilt_output = _remove_baseline_wander_with_medfilt(segment)
+        median_output = pyCBPE.preprocessing._remove_baseline_wander(segment, consts.MOVING_MEDIAN_BASELINE)
+        mean_output = pyCBPE.preprocessing._remove_baseline_wander(segment, consts.MOVING_MEAN_BASELINE)
+
+        print("    scipy medfilt:  {:.3f} ms per segment".format(medfilt_time))
+        print("    moving median:  {:.3f} ms per segment ({:.1f}x), max abs difference {:.2e}".format(
+            median_time, medfilt_time / median_time, np.max(np.abs(median_output - medfilt_output))))
+        print("    moving mean:    {:.3f} ms per segment ({:.1f}x), max abs difference {:.2e}".format(
+            mean_time, medfilt_time / mean_time, np.max(np.abs(mean_output - medfilt_output))))
+
+
+def _remove_baseline_wander_with_medfilt(ppg_signal):
+    # reference implementation used before the running median engine
+    signal_length = np.shape(ppg_signal)[-1]
+    first_window_size = int(np.floor(0.7 * signal_length))
+    second_window_size = int(np.floor(0.3 * signal_length))
+    other_axes_kernel = [1] * (np.ndim(ppg_signal) - 1)
+
+    mov_median_output = signal.medfilt(ppg_signal, other_axes_kernel + [first_window_size])
+    mov_median_output = signal.medfilt(mov_median_output, other_axes_kernel + [second_window_size])
+
+    return np.subtract(ppg_signal, mov_median_output)
+
+
+def _time_per_segment(function):
+    total_time = min(timeit.repeat(function, number=1, repeat=N_OF_REPETITIONS))
+    time_per_segment_in_ms = 1000 * total_time / BATCH_SIZE
+
+    return time_per_segment_in_ms
+
+
+if __name__ == "__main__":
+    main()
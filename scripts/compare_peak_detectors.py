@@ -0,0 +1,89 @@
+""" This script is responsible for comparing the accuracy, time and memory of
+the peak detectors against AMPD on the segments of a dataset split. """
+
+# Libraries
+import numpy as np
+import time
+import tracemalloc
+
+# Package modules
+import pyCBPE.preprocessing
+import pyCBPE.peak_detection
+import pyCBPE.segment_store
+import pyCBPE.constants as consts
+
+N_OF_SEGMENTS = 200
+MATCHING_TOLERANCE = 0.05 # in seconds
+DETECTORS = [consts.AMPD_DETECTOR, consts.BOUNDED_AMPD_DETECTOR, consts.LINEAR_DETECTOR]
+
+
+def main():
+    print("##### pyCBPE Framework #####")
+    print("### Peak detectors comparison script ###")
+
+    segment_store = pyCBPE.segment_store.SegmentStore(consts.ROOT_PATH + consts.DATASET_PATH + consts.SEGMENT_STORE_PREFIX + "1")
+    ppg_matrix = np.asarray(segment_store.segments(consts.PPG_SIGNAL)[0:N_OF_SEGMENTS], dtype=float)
+    abp_matrix = np.asarray(segment_store.segments(consts.ABP_SIGNAL)[0:N_OF_SEGMENTS], dtype=float)
+    preprocessed_ppg_matrix = pyCBPE.preprocessing.preprocess_batch(ppg_matrix)
+
+    # signals searched by each call site of the pipeline
+    call_sites = {
+        "ppg minima (hrv)": (-ppg_matrix, consts.SAMPLING_FREQ),
+        "preprocessed ppg minima (normalization)": (-preprocessed_ppg_matrix, consts.UPSAMPLED_SAMPLING_FREQ),
+        "abp maxima (labels)": (abp_matrix, consts.SAMPLING_FREQ),
+        "abp minima (labels)": (-abp_matrix, consts.SAMPLING_FREQ)
+    }
+
+    for call_site, (signal_matrix, sampling_freq) in call_sites.items():
+        print(call_site + ":")
+        tolerance = int(MATCHING_TOLERANCE * sampling_freq)
+        reference_peaks = [pyCBPE.peak_detection.find_beats(signal, sampling_freq, consts.AMPD_DETECTOR) for signal in signal_matrix]
+
+        for detector in DETECTORS:
+            detector_time, detector_memory = _measure(signal_matrix, sampling_freq, detector)
+            detected_peaks = [pyCBPE.peak_detection.find_beats(signal, sampling_freq, detector) for signal in signal_matrix]
+            precision, recall = _match(reference_peaks, detected_peaks, tolerance)
+
+            print("    {:<14} {:8.3f} ms {:10.1f} KiB   precision {:6.2%}   recall {:6.2%}".format(
+                detector, detector_time, detector_memory, precision, recall))
+
+
+def _measure(signal_matrix, sampling_freq, detector):
+    # time per segment and memory peak of a single call
+    start_time = time.perf_counter()
+    for signal in signal_matrix:
+        pyCBPE.peak_detection.find_beats(signal, sampling_freq, detector)
+    time_per_segment_in_ms = 1000 * (time.perf_counter() - start_time) / len(signal_matrix)
+
+    tracemalloc.start()
+    pyCBPE.peak_detection.find_beats(signal_matrix[0], sampling_freq, detector)
+    _, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return time_per_segment_in_ms, memory_peak / 1024
+
+
+def _match(reference_peaks, detected_peaks, tolerance):
+    # a peak is matched if a peak of the other detector is within tolerance
+    n_of_reference = 0
+    n_of_detected = 0
+    n_of_matched_detected = 0
+    n_of_matched_reference = 0
+    for reference, detected in zip(reference_peaks, detected_peaks):
+        n_of_reference += len(reference)
+        n_of_detected += len(detected)
+        if len(reference) == 0 or len(detected) == 0:
+            continue
+
+        distances = np.abs(detected[:, np.newaxis] - reference[np.newaxis, :])
+        n_of_matched_detected += np.count_nonzero(np.min(distances, axis=1) <= tolerance)
+        n_of_matched_reference += np.count_nonzero(np.min(distances, axis=0) <= tolerance)
+
+    precision = n_of_matched_detected / n_of_detected if n_of_detected > 0 else 0
+    recall = n_of_matched_reference / n_of_reference if n_of_reference > 0 else 0
+
+    return precision, recall
+
+
+if __name__ == "__main__":
+    main()
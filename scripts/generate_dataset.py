@@ -2,37 +2,70 @@
 in pyCBPE framework. """
 
 # Libraries
+import argparse
+import os
 import numpy as np
-import pandas as pd
 import time
 import matplotlib.pyplot as plt
 
 # Package modules
 import pyCBPE.preprocessing
+import pyCBPE.filter_bank
+import pyCBPE.running_median
 import pyCBPE.normalization
+import pyCBPE.peak_detection
 import pyCBPE.key_points
+import pyCBPE.polynomial_fitting
+import pyCBPE.hrv
 import pyCBPE.features
 import pyCBPE.labels
+import pyCBPE.result_writer
+import pyCBPE.segment_store
+import pyCBPE.artifacts
+import pyCBPE.parallel
+import pyCBPE.checkpoint
+import pyCBPE.sharding
 import pyCBPE.constants as consts
 
+# the preprocessed segments are stored in single precision, like the segments
+PREPROCESSED_PPG_DTYPE = np.float32
+
 
 def main():
     """
     This is the main script, everytime make is run it runs this script,
     so just insert your commands here.
     """
+    parser = argparse.ArgumentParser(description="Generate the features and labels of the dataset splits.")
+    parser.add_argument("--workers", type=int, default=consts.N_OF_WORKERS,
+                        help="number of worker processes, 1 runs the pipeline in this process")
+    parser.add_argument("--shard", type=pyCBPE.sharding.parse_shard, default=None,
+                        help="i/N, only generate the i-th of N consecutive ranges of segments of each split")
+    parser.add_argument("--root", default=consts.ROOT_PATH, help="root directory of the files directory")
+    parser.add_argument("--beat-labels", action="store_true",
+                        help="label each segment from the abp beat of its central ppg pulse instead of its whole abp segment")
+    args = parser.parse_args()
+
     print("##### pyCBPE Framework #####")
     print("### Dataset generator script ###")
 
     print("Loading datasets...")
     load_start_time = time.time()
 
+    artifact_store = pyCBPE.artifacts.ArtifactStore(args.root + consts.ARTIFACTS_PATH)
+
     for dataset_index in range(consts.N_OF_DATASET_FILES):
-        ppg_dataset_path = consts.ROOT_PATH + consts.DATASET_PATH + consts.PPG_DF_PREFIX + str(dataset_index + 1) + consts.CSV_SUFIX
-        abp_dataset_path = consts.ROOT_PATH + consts.DATASET_PATH + consts.ABP_DF_PREFIX + str(dataset_index + 1) + consts.CSV_SUFIX
+        # the segments are memory mapped, so only the rows in use are read
+        segment_store_path = args.root + consts.DATASET_PATH + consts.SEGMENT_STORE_PREFIX + str(dataset_index + 1)
+        segment_store = pyCBPE.segment_store.SegmentStore(segment_store_path)
 
-        ppg_matrix_df = pd.read_csv(ppg_dataset_path)
-        abp_matrix_df = pd.read_csv(abp_dataset_path)
+        # a shard only generates its own range of segments
+        segments_start, segments_stop = 0, len(segment_store)
+        if args.shard is not None:
+            segments_start, segments_stop = pyCBPE.sharding.shard_range(len(segment_store), *args.shard)
+
+        ppg_matrix = segment_store.segments(consts.PPG_SIGNAL)[segments_start:segments_stop]
+        abp_matrix = segment_store.segments(consts.ABP_SIGNAL)[segments_start:segments_stop]
 
         load_stop_time = time.time()
         load_time_in_sec = load_stop_time - load_start_time
@@ -41,41 +74,85 @@ def main():
         print("Time taken loading datasets: ")
         print(load_time_in_min)
 
-        # Create dataframe to store features and labels
-        features_and_labels_df = pd.DataFrame(columns=consts.FEATURES_AND_LABELS_COLUMNS)
-
         # Beginning of for loop
         total_execution_start_time = time.time()
-        for segment_index in range(len(ppg_matrix_df.index)):
-            print("Current segment index:")
-            print(segment_index)
-            ppg_seg = ppg_matrix_df.iloc[segment_index, :].to_numpy()
-            abp_seg = abp_matrix_df.iloc[segment_index, :].to_numpy()
 
+        # the outputs of the stages before the features are reused while
+        # their code, configuration and input do not change
+        split_name = "split_" + str(dataset_index + 1) + pyCBPE.sharding.shard_suffix(args.shard)
+        preprocessing_fingerprint, normalization_fingerprint, key_points_fingerprint = _get_stages_fingerprints(segment_store.signal_path(consts.PPG_SIGNAL))
+        hrv_fingerprint = _get_hrv_fingerprint(segment_store, segments_start, segments_stop)
+        beat_labels_fingerprint = None
+        if args.beat_labels:
+            beat_labels_fingerprint = _get_beat_labels_fingerprint(normalization_fingerprint, segment_store, segments_start, segments_stop)
+        features_and_labels_fingerprint = _get_features_and_labels_fingerprint(key_points_fingerprint, hrv_fingerprint,
+                                                                               beat_labels_fingerprint,
+                                                                               segment_store.signal_path(consts.ABP_SIGNAL))
+
+        # the completed chunks of every stage are kept until the stage is
+        # stored, so an interrupted run resumes from its last chunk
+        run_manifest = pyCBPE.checkpoint.RunManifest(args.root + consts.RUNS_PATH + split_name)
+
+        def load_preprocessed_ppg():
             print("Running preprocessing module...")
-            preprocessed_ppg = pyCBPE.preprocessing.preprocess(ppg_seg)
+            artifact_name = split_name + "_" + consts.PREPROCESSING_STAGE
+            preprocessed_ppg_arrays = artifact_store.load_or_compute(
+                artifact_name, preprocessing_fingerprint,
+                lambda: _preprocess(artifact_store, artifact_name, run_manifest, preprocessing_fingerprint, ppg_matrix, args.workers))
+            run_manifest.finish_stage(consts.PREPROCESSING_STAGE)
+            return preprocessed_ppg_arrays
 
+        def load_normalized_ppg_pulses():
             print("Running normalization module...")
-            normalized_ppg_pulse = pyCBPE.normalization.normalize(preprocessed_ppg)
+            normalized_ppg_pulses_arrays = artifact_store.load_or_compute(
+                split_name + "_" + consts.NORMALIZATION_STAGE, normalization_fingerprint,
+                lambda: _normalize(run_manifest, normalization_fingerprint, load_preprocessed_ppg()["preprocessed_ppg"], args.workers))
+            run_manifest.finish_stage(consts.NORMALIZATION_STAGE)
+            return normalized_ppg_pulses_arrays
+
+        normalized_ppg_pulses_arrays = load_normalized_ppg_pulses()
 
-            print("Running key points module...")
-            key_points_loc = pyCBPE.key_points.extract(normalized_ppg_pulse)
+        print("Running key points module...")
+        key_points_arrays = artifact_store.load_or_compute(
+            split_name + "_" + consts.KEY_POINTS_STAGE, key_points_fingerprint,
+            lambda: _extract_key_points(run_manifest, key_points_fingerprint, normalized_ppg_pulses_arrays, args.workers))
+        run_manifest.finish_stage(consts.KEY_POINTS_STAGE)
 
-            print("Running features module...")
-            features_list = pyCBPE.features.extract(consts.SAMPLING_FREQ, ppg_seg, normalized_ppg_pulse, key_points_loc)
+        print("Running HRV module...")
+        hrv_arrays = artifact_store.load_or_compute(
+            split_name + "_" + consts.HRV_STAGE, hrv_fingerprint,
+            lambda: _calculate_hrv_properties(run_manifest, hrv_fingerprint, segment_store, segments_start, segments_stop, args.workers))
+        run_manifest.finish_stage(consts.HRV_STAGE)
 
-            print("Running labels module...")
-            labels_list = pyCBPE.labels.extract(abp_seg)
+        if args.beat_labels:
+            print("Running beat labels module...")
+            beat_labels_arrays = artifact_store.load_or_compute(
+                split_name + "_" + consts.BEAT_LABELS_STAGE, beat_labels_fingerprint,
+                lambda: _calculate_beat_labels(run_manifest, beat_labels_fingerprint, segment_store, segments_start, segments_stop,
+                                               normalized_ppg_pulses_arrays["onsets"], args.workers))
+            run_manifest.finish_stage(consts.BEAT_LABELS_STAGE)
 
-            to_append = []
-            to_append.extend(features_list)
-            to_append.extend(labels_list)
-            pd_series_to_append = pd.Series(to_append, index=features_and_labels_df.columns)
-            features_and_labels_df = features_and_labels_df.append(pd_series_to_append, ignore_index=True)
+        print("Running features and labels modules...")
+        segments_arrays = {
+            "ppg": ppg_matrix,
+            "abp": abp_matrix,
+            "pulses_offsets": normalized_ppg_pulses_arrays["offsets"],
+            "pulses_values": normalized_ppg_pulses_arrays["values"],
+            "key_points_indexes": key_points_arrays["indexes"],
+            "key_points_is_valid": key_points_arrays["is_valid"],
+            "hrv_properties": hrv_arrays["hrv_properties"]
+        }
+        if args.beat_labels:
+            segments_arrays["labels"] = beat_labels_arrays["labels"]
+        features_and_labels_chunks = _run_stage(run_manifest, consts.FEATURES_AND_LABELS_STAGE, features_and_labels_fingerprint,
+                                                _extract_features_and_labels, segments_arrays, len(ppg_matrix), args.workers)
 
-        # Export dataframe as a csv file
-        feat_and_label_path = consts.ROOT_PATH + consts.DATASET_PATH + consts.FEATURES_AND_LABELS_DF_PREFIX + str(dataset_index + 1) + consts.CSV_SUFIX
-        features_and_labels_df.to_csv(feat_and_label_path, index=False)
+        # the chunks are merged into a temporary file that only replaces the
+        # csv file once every chunk is written
+        feat_and_label_path = (args.root + consts.DATASET_PATH + consts.FEATURES_AND_LABELS_DF_PREFIX + str(dataset_index + 1) +
+                               pyCBPE.sharding.shard_suffix(args.shard) + consts.CSV_SUFIX)
+        _merge_features_and_labels(features_and_labels_chunks, feat_and_label_path)
+        run_manifest.finish_stage(consts.FEATURES_AND_LABELS_STAGE)
 
         print("Features and labels dataframe successfully exported.")
 
@@ -89,5 +166,277 @@ def main():
     print("minutes.")
 
 
+def _get_stages_fingerprints(ppg_dataset_path):
+    # the stages before the features only fingerprint the constants and the
+    # functions of this script they run, so feature work keeps their outputs
+    preprocessing_fingerprint = pyCBPE.artifacts.fingerprint(
+        consts.PREPROCESSING_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.preprocessing, pyCBPE.filter_bank, pyCBPE.running_median,
+                                          _preprocess, _preprocess_chunk),
+        (consts.SAMPLING_FREQ, consts.SEGMENT_TIME, consts.LOW_PASS_FILTER_ORDER, consts.LOW_PASS_MAX_RIPPLE,
+         consts.LOW_PASS_CUT_OFF_FREQ, consts.BASELINE_WANDER_METHOD, consts.UPSAMPLE_FACTOR, consts.RESAMPLER,
+         PREPROCESSED_PPG_DTYPE),
+        pyCBPE.artifacts.file_fingerprint(ppg_dataset_path))
+
+    normalization_fingerprint = pyCBPE.artifacts.fingerprint(
+        consts.NORMALIZATION_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.normalization, pyCBPE.peak_detection, pyCBPE.artifacts.pack_ragged,
+                                          pyCBPE.artifacts.unpack_ragged, _normalize, _normalize_chunk),
+        (consts.SAMPLING_FREQ, consts.UPSAMPLE_FACTOR, consts.NORMALIZATION_PEAK_DETECTOR, consts.MIN_BEAT_INTERVAL,
+         consts.MAX_BEAT_INTERVAL, consts.MIN_BEAT_RELATIVE_PROMINENCE, consts.ASCENDING_POL_N_OF_COEFS,
+         consts.DESCENDING_POL_N_OF_COEFS),
+        preprocessing_fingerprint)
+
+    key_points_fingerprint = pyCBPE.artifacts.fingerprint(
+        consts.KEY_POINTS_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.key_points, pyCBPE.polynomial_fitting, pyCBPE.artifacts.unpack_ragged,
+                                          _extract_key_points, _extract_key_points_chunk, _get_pulses),
+        (consts.SAMPLING_FREQ, consts.UPSAMPLE_FACTOR, consts.ASCENDING_POL_ORDER, consts.DESCENDING_POL_ORDER,
+         consts.KEY_POINTS),
+        normalization_fingerprint)
+
+    return preprocessing_fingerprint, normalization_fingerprint, key_points_fingerprint
+
+
+def _get_hrv_fingerprint(segment_store, segments_start, segments_stop):
+    # the record boundaries are kept in the header of the segment store
+    return pyCBPE.artifacts.fingerprint(
+        consts.HRV_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.hrv, pyCBPE.peak_detection, consts, _calculate_hrv_properties,
+                                          _calculate_hrv_properties_chunk, _get_records_range),
+        (consts.SAMPLING_FREQ, consts.SEGMENT_TIME, consts.HRV_WINDOW_TIME, consts.HRV_PEAK_DETECTOR, segments_start, segments_stop),
+        pyCBPE.artifacts.file_fingerprint(segment_store.signal_path(consts.PPG_SIGNAL)),
+        pyCBPE.artifacts.file_fingerprint(os.path.join(segment_store.path, consts.SEGMENT_STORE_HEADER)))
+
+
+def _get_features_and_labels_fingerprint(key_points_fingerprint, hrv_fingerprint, beat_labels_fingerprint, abp_dataset_path):
+    return pyCBPE.artifacts.fingerprint(
+        consts.FEATURES_AND_LABELS_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.features, pyCBPE.filter_bank, pyCBPE.labels, pyCBPE.peak_detection,
+                                          pyCBPE.key_points.KeyPointsBatch, pyCBPE.artifacts.unpack_ragged, consts,
+                                          _extract_features_and_labels, _get_pulses),
+        (consts.SAMPLING_FREQ, consts.UPSAMPLE_FACTOR, consts.MIN_BEAT_INTERVAL, consts.MAX_BEAT_INTERVAL,
+         consts.MIN_BEAT_RELATIVE_PROMINENCE, consts.FEATURES_AND_LABELS_COLUMNS),
+        key_points_fingerprint,
+        hrv_fingerprint,
+        beat_labels_fingerprint,
+        pyCBPE.artifacts.file_fingerprint(abp_dataset_path))
+
+
+def _get_beat_labels_fingerprint(normalization_fingerprint, segment_store, segments_start, segments_stop):
+    # the central pulses come from the normalization stage
+    return pyCBPE.artifacts.fingerprint(
+        consts.BEAT_LABELS_STAGE,
+        pyCBPE.artifacts.code_fingerprint(pyCBPE.labels, pyCBPE.peak_detection, consts, _calculate_beat_labels,
+                                          _calculate_beat_labels_chunk, _get_records_range),
+        (consts.SAMPLING_FREQ, consts.UPSAMPLE_FACTOR, consts.RECORDING_PEAK_DETECTOR, consts.MAX_PULSE_ARRIVAL_DELAY,
+         segments_start, segments_stop),
+        normalization_fingerprint,
+        pyCBPE.artifacts.file_fingerprint(segment_store.signal_path(consts.ABP_SIGNAL)),
+        pyCBPE.artifacts.file_fingerprint(os.path.join(segment_store.path, consts.SEGMENT_STORE_HEADER)))
+
+
+def _run_stage(run_manifest, stage_name, stage_fingerprint, function, arrays, n_of_rows, n_of_workers):
+    # yield the arrays of every chunk of a stage in order, loading the ones
+    # completed by a previous run and computing and checkpointing the others
+    run_manifest.start_stage(stage_name, stage_fingerprint)
+
+    chunks = pyCBPE.parallel.split_chunks(n_of_rows)
+    pending_chunks = [chunk for chunk in chunks if not run_manifest.is_completed(stage_name, *chunk)]
+    computed_chunks = pyCBPE.parallel.map_chunks(function, arrays, n_of_rows, n_of_workers=n_of_workers, chunks=pending_chunks)
+
+    for chunk_start, chunk_stop in chunks:
+        print("Current segments:")
+        print(str(chunk_start) + " to " + str(chunk_stop - 1))
+
+        if run_manifest.is_completed(stage_name, chunk_start, chunk_stop):
+            yield run_manifest.load_chunk(stage_name, chunk_start, chunk_stop)
+        else:
+            chunk_arrays = next(computed_chunks)
+            run_manifest.save_chunk(stage_name, chunk_start, chunk_stop, chunk_arrays)
+            yield chunk_arrays
+
+
+def _merge_features_and_labels(features_and_labels_chunks, feat_and_label_path):
+    temporary_path = feat_and_label_path + ".tmp"
+    with pyCBPE.result_writer.ResultWriter(temporary_path, consts.FEATURES_AND_LABELS_COLUMNS) as features_and_labels_writer:
+        for chunk_arrays in features_and_labels_chunks:
+            features_and_labels_writer.write_rows(chunk_arrays["features_and_labels"])
+
+    os.replace(temporary_path, feat_and_label_path)
+
+
+def _preprocess(artifact_store, artifact_name, run_manifest, stage_fingerprint, ppg_matrix, n_of_workers):
+    # the chunks are written in place into the memory map of the artifact,
+    # so the preprocessed split is never held in memory
+    n_of_segments, segment_length = np.shape(ppg_matrix)
+    preprocessed_ppg_matrix = artifact_store.open_array(
+        artifact_name, stage_fingerprint, "preprocessed_ppg",
+        (n_of_segments, pyCBPE.preprocessing.get_upsampled_length(segment_length)), PREPROCESSED_PPG_DTYPE)
+
+    chunk_start = 0
+    for chunk_arrays in _run_stage(run_manifest, consts.PREPROCESSING_STAGE, stage_fingerprint, _preprocess_chunk,
+                                   {"ppg": ppg_matrix}, n_of_segments, n_of_workers):
+        chunk_stop = chunk_start + len(chunk_arrays["preprocessed_ppg"])
+        preprocessed_ppg_matrix[chunk_start:chunk_stop] = chunk_arrays["preprocessed_ppg"]
+        chunk_start = chunk_stop
+
+    return {"preprocessed_ppg": preprocessed_ppg_matrix}
+
+
+def _preprocess_chunk(arrays, chunk_start, chunk_stop):
+    preprocessed_ppg_chunk = pyCBPE.preprocessing.preprocess_batch(arrays["ppg"][chunk_start:chunk_stop])
+
+    return {"preprocessed_ppg": preprocessed_ppg_chunk.astype(PREPROCESSED_PPG_DTYPE)}
+
+
+def _normalize(run_manifest, stage_fingerprint, preprocessed_ppg_matrix, n_of_workers):
+    normalized_ppg_pulses = []
+    central_pulses_onsets = []
+    for chunk_arrays in _run_stage(run_manifest, consts.NORMALIZATION_STAGE, stage_fingerprint, _normalize_chunk,
+                                   {"preprocessed_ppg": preprocessed_ppg_matrix}, len(preprocessed_ppg_matrix), n_of_workers):
+        normalized_ppg_pulses.extend(pyCBPE.artifacts.unpack_ragged(chunk_arrays["offsets"], chunk_arrays["values"]))
+        central_pulses_onsets.append(chunk_arrays["onsets"])
+    offsets, values = pyCBPE.artifacts.pack_ragged(normalized_ppg_pulses)
+    onsets = np.concatenate(central_pulses_onsets) if central_pulses_onsets else np.zeros(0, dtype=np.int64)
+
+    return {"offsets": offsets, "values": values, "onsets": onsets}
+
+
+def _normalize_chunk(arrays, chunk_start, chunk_stop):
+    # the onset of each central pulse, in upsampled samples of its segment,
+    # places the pulse in its record for the beat labels
+    normalized_ppg_pulses = []
+    onsets = np.empty(chunk_stop - chunk_start, dtype=np.int64)
+    for segment_index, preprocessed_ppg in enumerate(arrays["preprocessed_ppg"][chunk_start:chunk_stop]):
+        normalized_ppg_pulse, onsets[segment_index] = pyCBPE.normalization.normalize_central_pulse(np.asarray(preprocessed_ppg, dtype=float))
+        normalized_ppg_pulses.append(normalized_ppg_pulse)
+    offsets, values = pyCBPE.artifacts.pack_ragged(normalized_ppg_pulses)
+
+    return {"offsets": offsets, "values": values, "onsets": onsets}
+
+
+def _extract_key_points(run_manifest, stage_fingerprint, normalized_ppg_pulses_arrays, n_of_workers):
+    pulses_arrays = {"offsets": normalized_ppg_pulses_arrays["offsets"], "values": normalized_ppg_pulses_arrays["values"]}
+    key_points_chunks = list(_run_stage(run_manifest, consts.KEY_POINTS_STAGE, stage_fingerprint, _extract_key_points_chunk,
+                                        pulses_arrays, len(pulses_arrays["offsets"]) - 1, n_of_workers))
+
+    return {"indexes": np.concatenate([chunk_arrays["indexes"] for chunk_arrays in key_points_chunks]),
+            "is_valid": np.concatenate([chunk_arrays["is_valid"] for chunk_arrays in key_points_chunks])}
+
+
+def _extract_key_points_chunk(arrays, chunk_start, chunk_stop):
+    normalized_ppg_pulses = _get_pulses(arrays["offsets"], arrays["values"], chunk_start, chunk_stop)
+    key_points_batch = pyCBPE.key_points.KeyPointsBatch.from_key_points(
+        [pyCBPE.key_points.extract(np.asarray(normalized_ppg_pulse)) for normalized_ppg_pulse in normalized_ppg_pulses])
+
+    return {"indexes": key_points_batch.indexes, "is_valid": key_points_batch.is_valid}
+
+
+def _calculate_hrv_properties(run_manifest, stage_fingerprint, segment_store, segments_start, segments_stop, n_of_workers):
+    # the HRV of a segment depends on the beats before it in its record, so
+    # it is calculated on the whole records that overlap the segments
+    record_offsets = segment_store.record_offsets
+    record_start, record_stop = _get_records_range(record_offsets, segments_start, segments_stop)
+
+    records_arrays = {"ppg": segment_store.segments(consts.PPG_SIGNAL), "record_offsets": record_offsets[record_start:record_stop + 1]}
+    hrv_properties_chunks = [chunk_arrays["hrv_properties"] for chunk_arrays in
+                             _run_stage(run_manifest, consts.HRV_STAGE, stage_fingerprint, _calculate_hrv_properties_chunk,
+                                        records_arrays, record_stop - record_start, n_of_workers)]
+    hrv_properties = np.concatenate(hrv_properties_chunks) if hrv_properties_chunks else np.zeros((0, len(consts.HRV_PROPERTIES)))
+
+    first_segment = int(record_offsets[record_start]) if record_stop > record_start else segments_start
+
+    return {"hrv_properties": hrv_properties[segments_start - first_segment:segments_stop - first_segment]}
+
+
+def _calculate_hrv_properties_chunk(arrays, chunk_start, chunk_stop):
+    record_offsets = arrays["record_offsets"]
+    hrv_properties = []
+    for record_index in range(chunk_start, chunk_stop):
+        # the segments of a record are consecutive rows, so together they
+        # are its recording without the samples after the last segment
+        record_segments = arrays["ppg"][record_offsets[record_index]:record_offsets[record_index + 1]]
+        hrv_properties.append(pyCBPE.hrv.recording_hrv_properties(np.ravel(record_segments)))
+
+    return {"hrv_properties": np.concatenate(hrv_properties)}
+
+
+def _calculate_beat_labels(run_manifest, stage_fingerprint, segment_store, segments_start, segments_stop, onsets, n_of_workers):
+    # the beats of a record are detected once on its whole abp recording,
+    # but only the segments of the shard are labelled
+    record_offsets = segment_store.record_offsets
+    record_start, record_stop = _get_records_range(record_offsets, segments_start, segments_stop)
+
+    records_arrays = {
+        "abp": segment_store.segments(consts.ABP_SIGNAL),
+        "record_offsets": record_offsets[record_start:record_stop + 1],
+        "segments_range": np.array([segments_start, segments_stop]),
+        "onsets": onsets
+    }
+    labels_chunks = [chunk_arrays["labels"] for chunk_arrays in
+                     _run_stage(run_manifest, consts.BEAT_LABELS_STAGE, stage_fingerprint, _calculate_beat_labels_chunk,
+                                records_arrays, record_stop - record_start, n_of_workers)]
+    labels = np.concatenate(labels_chunks) if labels_chunks else np.zeros((0, len(consts.LABELS_COLUMNS)), dtype=np.int16)
+
+    return {"labels": labels}
+
+
+def _calculate_beat_labels_chunk(arrays, chunk_start, chunk_stop):
+    record_offsets = arrays["record_offsets"]
+    segments_start, segments_stop = (int(segment) for segment in arrays["segments_range"])
+    segment_length = arrays["abp"].shape[1]
+    labels = [np.zeros((0, len(consts.LABELS_COLUMNS)), dtype=np.int16)]
+    for record_index in range(chunk_start, chunk_stop):
+        record_first_segment = int(record_offsets[record_index])
+        record_segments = arrays["abp"][record_first_segment:record_offsets[record_index + 1]]
+        abp_onsets, beats_labels = pyCBPE.labels.recording_beats(np.ravel(record_segments))
+
+        # a record can start before or end after the segments of the shard
+        first_segment = max(record_first_segment, segments_start)
+        last_segment = min(int(record_offsets[record_index + 1]), segments_stop)
+        onsets = arrays["onsets"][first_segment - segments_start:last_segment - segments_start]
+        pulse_times = ((np.arange(first_segment, last_segment) - record_first_segment) * segment_length +
+                       onsets / consts.UPSAMPLE_FACTOR) / consts.SAMPLING_FREQ
+
+        pulses_labels, _ = pyCBPE.labels.pulses_labels(pulse_times, abp_onsets / consts.SAMPLING_FREQ, beats_labels)
+        pulses_labels[onsets < 0] = -1
+        labels.append(pulses_labels)
+
+    return {"labels": np.concatenate(labels)}
+
+
+def _get_records_range(record_offsets, segments_start, segments_stop):
+    # the records that overlap the segments from segments_start to segments_stop
+    record_start = int(np.searchsorted(record_offsets[1:], segments_start, side="right"))
+    record_stop = max(int(np.searchsorted(record_offsets[:-1], segments_stop, side="left")), record_start)
+
+    return record_start, record_stop
+
+
+def _extract_features_and_labels(arrays, chunk_start, chunk_stop):
+    normalized_ppg_pulses = _get_pulses(arrays["pulses_offsets"], arrays["pulses_values"], chunk_start, chunk_stop)
+    key_points_batch = pyCBPE.key_points.KeyPointsBatch.from_arrays(arrays["key_points_indexes"][chunk_start:chunk_stop],
+                                                                    arrays["key_points_is_valid"][chunk_start:chunk_stop])
+
+    # float64 keeps exp(Heart rate) finite
+    features_matrix = pyCBPE.features.extract_batch(consts.SAMPLING_FREQ, arrays["ppg"][chunk_start:chunk_stop],
+                                                    normalized_ppg_pulses, key_points_batch,
+                                                    hrv_properties=arrays["hrv_properties"][chunk_start:chunk_stop], dtype=np.float64)
+    if "labels" in arrays:
+        labels_matrix = arrays["labels"][chunk_start:chunk_stop]
+    else:
+        labels_matrix, _ = pyCBPE.labels.extract_batch(arrays["abp"][chunk_start:chunk_stop])
+
+    return {"features_and_labels": np.hstack((features_matrix, labels_matrix))}
+
+
+def _get_pulses(offsets, values, chunk_start, chunk_stop):
+    # pulses of a chunk of segments packed by artifacts.pack_ragged
+    chunk_offsets = np.asarray(offsets[chunk_start:chunk_stop + 1])
+
+    return pyCBPE.artifacts.unpack_ragged(chunk_offsets, values)
+
+
 if __name__ == "__main__":
     main()
@@ -56,7 +56,7 @@ def main():
     MODEL_FOLDER_OUTPUT_PATH = consts.ROOT_PATH + "/files/estimators/" + MODEL_NAME + "/"
     MODEL_JOBLIB_FILENAME = MODEL_NAME + ".joblib"
 
-    os.mkdir(MODEL_FOLDER_OUTPUT_PATH)
+    os.makedirs(MODEL_FOLDER_OUTPUT_PATH, exist_ok=True)
 
     pyCBPE.model.save_estimator(best_lr_model, MODEL_FOLDER_OUTPUT_PATH + MODEL_JOBLIB_FILENAME)
     # Export the generated metrics
@@ -0,0 +1,46 @@
+""" This script is responsible for merging the outputs of the shards of
+prepare_dataset or generate_dataset, in their canonical order. """
+
+# Libraries
+import argparse
+
+# Package modules
+import pyCBPE.segment_store
+import pyCBPE.sharding
+import pyCBPE.constants as consts
+
+PREPARE_DATASET = "prepare_dataset"
+GENERATE_DATASET = "generate_dataset"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the outputs of the shards of a dataset script.")
+    parser.add_argument("script", choices=[PREPARE_DATASET, GENERATE_DATASET], help="script whose shard outputs are merged")
+    parser.add_argument("--shards", type=int, required=True, help="number of shards N the script was run with")
+    parser.add_argument("--root", default=consts.ROOT_PATH, help="root directory of the files directory")
+    args = parser.parse_args()
+
+    print("##### pyCBPE Framework #####")
+    print("### Shards merging script ###")
+
+    shards = [(shard_index, args.shards) for shard_index in range(args.shards)]
+
+    for dataset_index in range(consts.N_OF_DATASET_FILES):
+        segment_store_path = args.root + consts.DATASET_PATH + consts.SEGMENT_STORE_PREFIX + str(dataset_index + 1)
+
+        if args.script == PREPARE_DATASET:
+            shard_store_paths = [segment_store_path + pyCBPE.sharding.shard_suffix(shard) for shard in shards]
+            n_of_segments = pyCBPE.sharding.merge_segment_stores(shard_store_paths, segment_store_path)
+            print(str(n_of_segments) + " segments merged into " + segment_store_path)
+        else:
+            # each shard must have generated its whole range of segments
+            n_of_segments = len(pyCBPE.segment_store.SegmentStore(segment_store_path))
+            feat_and_label_path = args.root + consts.DATASET_PATH + consts.FEATURES_AND_LABELS_DF_PREFIX + str(dataset_index + 1)
+            shard_csv_paths = [feat_and_label_path + pyCBPE.sharding.shard_suffix(shard) + consts.CSV_SUFIX for shard in shards]
+            n_of_rows = pyCBPE.sharding.merge_csv_files(shard_csv_paths, pyCBPE.sharding.shard_sizes(n_of_segments, args.shards),
+                                                        feat_and_label_path + consts.CSV_SUFIX)
+            print(str(n_of_rows) + " rows merged into " + feat_and_label_path + consts.CSV_SUFIX)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,11 +24,11 @@ def main():
 
     print("### Run preprocessing ###")
     preprocessed_ppg = pyCBPE.preprocessing.preprocess(ppg_seg)
-    t_pp = np.arange(0, len(preprocessed_ppg)/(4*consts.SAMPLING_FREQ), 1/(4*consts.SAMPLING_FREQ))
+    t_pp = np.arange(0, len(preprocessed_ppg)/consts.UPSAMPLED_SAMPLING_FREQ, 1/consts.UPSAMPLED_SAMPLING_FREQ)
 
     print("### Run normalization ###")
     normalized_ppg_pulse = pyCBPE.normalization.normalize(preprocessed_ppg)
-    t_norm = np.arange(0, len(normalized_ppg_pulse)/(4*consts.SAMPLING_FREQ), 1/(4*consts.SAMPLING_FREQ))
+    t_norm = np.arange(0, len(normalized_ppg_pulse)/consts.UPSAMPLED_SAMPLING_FREQ, 1/consts.UPSAMPLED_SAMPLING_FREQ)
 
     print("### Run key_points ###")
     key_points_loc = pyCBPE.key_points.extract(normalized_ppg_pulse)